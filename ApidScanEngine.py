@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from HttpClientFactory import DEFAULT_TIMEOUT, create_async_session
+
+# Default number of requests kept in flight by a scan
+DEFAULT_CONCURRENCY = 100
+
+
+def iter_apids(start, end):
+    """
+    Lazily yield APIDs A{start:05} .. A{end:05} (inclusive).
+    """
+    for i in range(start, end + 1):
+        yield f"A{str(i).zfill(5)}"
+
+
+def create_session(concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT):
+    """
+    Open a pooled aiohttp session whose connection limit matches the scan concurrency.
+    Must be called from inside a running event loop.
+    """
+    return create_async_session(limit=concurrency, timeout=timeout)
+
+
+async def scan(items, worker, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Run the coroutine function worker(item) over items with at most `concurrency`
+    calls in flight, yielding (item, result, error) tuples as calls complete.
+
+    Items are pulled from the iterable only when a slot frees up, so scanning a
+    large APID range never builds a task per APID up front. error is the
+    exception raised by worker (result is then None), otherwise None.
+    """
+    items = iter(items)
+    pending = {}
+
+    def fill():
+        while len(pending) < concurrency:
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            pending[asyncio.ensure_future(worker(item))] = item
+
+    fill()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = pending.pop(task)
+                error = task.exception()
+                if error is not None:
+                    logging.error(f"{item} generated an exception: {error}")
+                    yield item, None, error
+                else:
+                    yield item, task.result(), None
+            fill()
+    finally:
+        # Consumer stopped early: don't leave orphaned requests running
+        for task in pending:
+            task.cancel()
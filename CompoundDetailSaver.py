@@ -1,47 +1,45 @@
 
 import requests
+from HttpClientFactory import get_session
+from urllib.parse import quote
 import webbrowser
-import pubchempy as pcp
+from PubChemResponseCache import pubchem_cache
+from PubChemBatchProperties import fetch_properties, get_compound_details_for_apids
+from PubChemCasUniiExtractor import fetch_cas_unii
 
 # Function to get the CID (Compound Identifier) by name
 def get_cid_by_name(name):
-    compounds = pcp.get_compounds(name, 'name')
-    if compounds:
-        return compounds[0].cid
+    url = f'https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{quote(name, safe="")}/cids/JSON'
+    try:
+        cids = pubchem_cache.get_json(url).get('IdentifierList', {}).get('CID', [])
+    except requests.RequestException:
+        return None
+    if cids:
+        return cids[0]
     return None
 
 # Function to get CAS number and UNII for a given CID
 def get_cas_unii(cid):
-    url = f'https://pubchem.ncbi.nlm.nih.gov/rest/pug_view/data/compound/{cid}/JSON'
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        cas = unii = None
-        for section in data.get('Record', {}).get('Sections', []):
-            for subsection in section.get('Subsections', []):
-                for information in subsection.get('Information', []):
-                    if 'CAS' in information.get('Name', ''):
-                        cas = information.get('ValueString', 'Not found')
-                    if 'UNII' in information.get('Name', ''):
-                        unii = information.get('ValueString', 'Not found')
-        return cas, unii
-    else:
+    try:
+        return fetch_cas_unii(cid)
+    except requests.RequestException:
         return None, None
 
 # Function to get synonyms for a given CID
 def get_synonyms(cid):
     url = f'https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/synonyms/JSON'
-    response = requests.get(url)
-    if response.status_code == 200:
-        data = response.json()
-        synonyms = data.get('InformationList', {}).get('Information', [{}])[0].get('Synonym', [])
-        return synonyms
-    else:
+    try:
+        data = pubchem_cache.get_json(url)
+    except requests.RequestException:
         return []
+    synonyms = data.get('InformationList', {}).get('Information', [{}])[0].get('Synonym', [])
+    return synonyms
 
 # Function to get compound details and save them to a server
-def get_compound_details(name, apid):
-    cid = get_cid_by_name(name)
+# properties, cid: PubChem properties and CID if already fetched in a batch
+def get_compound_details(name, apid, properties=None, cid=None):
+    if cid is None:
+        cid = get_cid_by_name(name)
     web_page_opened = False  # Flag to track if the web page has been opened
 
     if cid:
@@ -58,17 +56,18 @@ def get_compound_details(name, apid):
                 web_page_opened = True  # Ensure the page is opened
             unii = input("UNII not found. Please enter the UNII: ")
 
-        compound = pcp.Compound.from_cid(cid)
+        if properties is None:
+            properties = fetch_properties([cid])[cid]
         details = {
             "APID": apid,
             "ingredient": name,
             "CID": cid,
             "CAS_No": cas_number,
             "UNII": unii,
-            "IUPAC_name": compound.iupac_name,
-            "molecular_formula": compound.molecular_formula,
-            "molecular_weight": compound.molecular_weight,
-            "smiles": compound.isomeric_smiles,
+            "IUPAC_name": properties['IUPACName'],
+            "molecular_formula": properties['MolecularFormula'],
+            "molecular_weight": properties['MolecularWeight'],
+            "smiles": properties['IsomericSMILES'],
             "Synonyms": ", ".join(synonyms),  # Save all synonyms
             "description": f"https://pubchem.ncbi.nlm.nih.gov/compound/{cid}"  # Link for manual description review
         }
@@ -81,7 +80,7 @@ def save_API_info(data):
     # Placeholder URL for the server API
     server_url = "https://example.com/api/save"
     try:
-        res = requests.post(server_url, json=data)
+        res = get_session().post(server_url, json=data)
         print("Server response:", res.text)
         return res.status_code == 200
     except requests.RequestException as e:
@@ -89,21 +88,23 @@ def save_API_info(data):
         return False
 
 # Example usage
-compound_name = "Aspirin"
-apid = "A00001"
+compounds = [("Aspirin", "A00001")]
 
-compound_details = get_compound_details(compound_name, apid)
-if compound_details:
-    print("Compound Details Found:")
-    for key, value in compound_details.items():
-        print(f"{key}: {value}")
-    user_description = input("Please enter the description you found: ")
-    compound_details["description"] = user_description if user_description else "User did not provide a description."
-    if save_API_info(compound_details):
-        print("Data successfully saved to server.")
+# Properties of all compounds are fetched in batches of PubChem CIDs
+all_details = get_compound_details_for_apids(compounds, get_cid_by_name, get_compound_details)
+for compound_name, apid in compounds:
+    compound_details = all_details[apid]
+    if compound_details:
+        print("Compound Details Found:")
+        for key, value in compound_details.items():
+            print(f"{key}: {value}")
+        user_description = input("Please enter the description you found: ")
+        compound_details["description"] = user_description if user_description else "User did not provide a description."
+        if save_API_info(compound_details):
+            print("Data successfully saved to server.")
+        else:
+            print("Failed to save data to server.")
     else:
-        print("Failed to save data to server.")
-else:
-    print("No compound found with the given name.")
+        print(f"No compound found with the name {compound_name}.")
 
 
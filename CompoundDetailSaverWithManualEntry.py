@@ -1,34 +1,32 @@
 import requests
+from HttpClientFactory import get_session
+from urllib.parse import quote
 import webbrowser
-import pubchempy as pcp
+from PubChemResponseCache import pubchem_cache
+from PubChemBatchProperties import fetch_properties, get_compound_details_for_apids
+from PubChemCasUniiExtractor import fetch_cas_unii
 
 def fetch_pubchem_data(url):
-    """Fetch data from PubChem given a URL."""
+    """Fetch data from PubChem given a URL, served from the local cache when possible."""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return pubchem_cache.get_json(url)
     except requests.RequestException as e:
         print(f"Error: {e}")
         return None
 
 def get_cid_by_name(name):
     """Get the CID for a given compound name."""
-    compounds = pcp.get_compounds(name, 'name')
-    return compounds[0].cid if compounds else None
+    data = fetch_pubchem_data(f'https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/name/{quote(name, safe="")}/cids/JSON')
+    cids = data.get('IdentifierList', {}).get('CID', []) if data else []
+    return cids[0] if cids else None
 
 def get_compound_info(cid):
     """Fetch compound information including CAS, UNII, and synonyms."""
     cas, unii, synonyms = "Not found", "Not found", []
-    data = fetch_pubchem_data(f'https://pubchem.ncbi.nlm.nih.gov/rest/pug_view/data/compound/{cid}/JSON')
-    if data:
-        for section in data.get('Record', {}).get('Sections', []):
-            for subsection in section.get('Subsections', []):
-                for info in subsection.get('Information', []):
-                    if 'CAS' in info.get('Name', ''):
-                        cas = info.get('ValueString', '')
-                    elif 'UNII' in info.get('Name', ''):
-                        unii = info.get('ValueString', '')
+    try:
+        cas, unii = [value or "Not found" for value in fetch_cas_unii(cid)]
+    except requests.RequestException as e:
+        print(f"Error: {e}")
     synonyms_data = fetch_pubchem_data(f'https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/synonyms/JSON')
     if synonyms_data:
         synonyms = synonyms_data.get('InformationList', {}).get('Information', [{}])[0].get('Synonym', [])
@@ -39,24 +37,27 @@ def manual_input(field_name, cid):
     webbrowser.open(f"https://pubchem.ncbi.nlm.nih.gov/compound/{cid}")
     return input(f"{field_name} not found. Please enter the {field_name}: ")
 
-def get_compound_details(name, apid):
-    """Gather compound details and prepare the dataset for saving."""
-    cid = get_cid_by_name(name)
+def get_compound_details(name, apid, properties=None, cid=None):
+    """Gather compound details and prepare the dataset for saving.
+    properties, cid: PubChem properties and CID if already fetched in a batch."""
+    if cid is None:
+        cid = get_cid_by_name(name)
     if cid:
         cas, unii, synonyms = get_compound_info(cid)
         cas = manual_input("CAS number", cid) if cas == "Not found" else cas
         unii = manual_input("UNII", cid) if unii == "Not found" else unii
-        compound = pcp.Compound.from_cid(cid)
+        if properties is None:
+            properties = fetch_properties([cid])[cid]
         details = {
             "APID": apid,
             "ingredient": name,
             "CID": cid,
             "CAS_No": cas,
             "UNII": unii,
-            "IUPAC_name": compound.iupac_name,
-            "molecular_formula": compound.molecular_formula,
-            "molecular_weight": compound.molecular_weight,
-            "smiles": compound.isomeric_smiles,
+            "IUPAC_name": properties['IUPACName'],
+            "molecular_formula": properties['MolecularFormula'],
+            "molecular_weight": properties['MolecularWeight'],
+            "smiles": properties['IsomericSMILES'],
             "Synonyms": ", ".join(synonyms),
             "description": f"https://pubchem.ncbi.nlm.nih.gov/compound/{cid}"
         }
@@ -69,7 +70,7 @@ def save_API_info(data):
     """Save the gathered information to a specified server."""
     server_url = "https://example.com/api"
     try:
-        response = requests.post(server_url, json=data)
+        response = get_session().post(server_url, json=data)
         if response.status_code == 200:
             print("Data successfully saved to server.")
         else:
@@ -79,12 +80,15 @@ def save_API_info(data):
 
 # Example usage
 if __name__ == "__main__":
-    compound_name = "Aspirin"
-    apid = "A00001"
+    compounds = [("Aspirin", "A00001")]
 
-    compound_details = get_compound_details(compound_name, apid)
-    if compound_details:
-        print("Compound Details Found:")
-        for key, value in compound_details.items():
-            print(f"{key}: {value}")
-        save_API_info(compound_details)
+    all_details = get_compound_details_for_apids(compounds, get_cid_by_name, get_compound_details)
+    for compound_name, apid in compounds:
+        compound_details = all_details[apid]
+        if compound_details:
+            print("Compound Details Found:")
+            for key, value in compound_details.items():
+                print(f"{key}: {value}")
+            save_API_info(compound_details)
+        else:
+            print(f"No compound found with the name {compound_name}.")
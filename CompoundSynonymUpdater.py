@@ -1,7 +1,10 @@
 import requests
+from HttpClientFactory import get_session
+from PubChemResponseCache import pubchem_cache
+from RateLimiter import configure_rate_limit
+from ScanCheckpointJournal import DONE, FAILED, SKIPPED, CheckpointJournal
 from tqdm import tqdm
 import logging
-import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -11,38 +14,44 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 API_DETAIL_URL = "http://example.com/api"
 PUBCHEM_URL = "https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/synonyms/JSON"
 
+# Requests per second allowed to our API (PubChem's limit is applied by RateLimiter)
+API_RATE_LIMIT = 10
+configure_rate_limit(API_DETAIL_URL, API_RATE_LIMIT)
+
 # Define the total number of drugs and the starting APID
 TOTAL_DRUGS = 384
-START_APID = 35
+START_APID = 1
+
+# Per-APID completion journal; main(resume=True) continues an interrupted run from it
+JOURNAL_FILE = "synonym_update.journal.jsonl"
 
+# Both fetch helpers return None / [] only when there really is no data and
+# raise requests.RequestException when the lookup itself failed, so main()
+# can retry failed APIDs on resume instead of skipping them for good.
 def fetch_cid(apid):
-    try:
-        response = requests.get(API_DETAIL_URL, params={'APID': apid}, timeout=10)
-        response.raise_for_status()  # Raises an exception for 4xx/5xx errors
-        data = response.json()
-        # Check if 'content' exists and is not None
-        if data.get('content') is not None:
-            return data.get('content').get('CID')
-        else:
-            return None
-    except requests.RequestException as e:
-        logging.error(f"Failed to fetch CID for APID: {apid}, Error: {e}")
+    response = get_session().get(API_DETAIL_URL, params={'APID': apid}, timeout=10)
+    response.raise_for_status()  # Raises an exception for 4xx/5xx errors
+    data = response.json()
+    # Check if 'content' exists and is not None
+    if data.get('content') is not None:
+        return data.get('content').get('CID')
+    else:
         return None
 
 def get_synonyms(cid):
+    url = PUBCHEM_URL.format(cid=cid)
     try:
-        url = PUBCHEM_URL.format(cid=cid)
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        return data.get("InformationList", {}).get("Information", [{}])[0].get("Synonym", [])
-    except requests.RequestException as e:
-        logging.error(f"Failed to fetch synonyms for CID: {cid}, Error: {e}")
-        return []
+        data = pubchem_cache.get_json(url)
+    except requests.HTTPError as e:
+        # 404: PubChem has no synonyms for this CID
+        if e.response is not None and e.response.status_code == 404:
+            return []
+        raise
+    return data.get("InformationList", {}).get("Information", [{}])[0].get("Synonym", [])
 
 def save_API_info(data):
     try:
-        res = requests.post(API_DETAIL_URL, json=data, timeout=10)
+        res = get_session().post(API_DETAIL_URL, json=data, timeout=10)
         res.raise_for_status()
         logging.info(f"Server response: {res.text}")
         return True
@@ -50,32 +59,44 @@ def save_API_info(data):
         logging.error(f"Error saving API info, Error: {e}")
         return False
 
-def main():
-    for i in tqdm(range(START_APID, TOTAL_DRUGS + 1), desc="Processing APIs"):
-        apid = f"A{i:05}"
-        cid = fetch_cid(apid)
-        if cid:
-            synonyms = get_synonyms(cid)
-            if synonyms:
-                data = {
-                    "APID": apid,
-                    "Synonyms": ", ".join(synonyms)
-                }
-                if save_API_info(data):
-                    logging.info(f"Synonyms for APID {apid} successfully saved to server.")
+def main(resume=False):
+    with CheckpointJournal(JOURNAL_FILE, resume) as journal:
+        for i in tqdm(range(START_APID, TOTAL_DRUGS + 1), desc="Processing APIs"):
+            apid = f"A{i:05}"
+            if journal.is_done(apid):
+                continue  # Completed in a previous run
+            try:
+                cid = fetch_cid(apid)
+                synonyms = get_synonyms(cid) if cid else []
+            except requests.RequestException as e:
+                logging.error(f"Failed to fetch CID or synonyms for APID: {apid}, Error: {e}")
+                journal.record(apid, FAILED)
+                continue
+            if cid:
+                if synonyms:
+                    data = {
+                        "APID": apid,
+                        "Synonyms": ", ".join(synonyms)
+                    }
+                    if save_API_info(data):
+                        logging.info(f"Synonyms for APID {apid} successfully saved to server.")
+                        journal.record(apid, DONE, data)
+                    else:
+                        logging.error(f"Failed to save synonyms for APID {apid} to server.")
+                        journal.record(apid, FAILED)
                 else:
-                    logging.error(f"Failed to save synonyms for APID {apid} to server.")
+                    logging.info(f"No synonyms found for APID {apid}.")
+                    journal.record(apid, SKIPPED)
             else:
-                logging.info(f"No synonyms found for APID {apid}.")
-        else:
-            logging.info(f"CID not found or APID {apid} does not exist, skipping.")
-            continue  # Skip the current loop iteration if CID is not found
-        time.sleep(1)  # Add a delay to respect API rate limits
+                logging.info(f"CID not found or APID {apid} does not exist, skipping.")
+                journal.record(apid, SKIPPED)
+                continue  # Skip the current loop iteration if CID is not found
+    pubchem_cache.log_stats()
 
 # Furthermore, if you're interested in extracting other fields, simply follow the same path to access those fields.
 # For example, if you want to get 'ingredient' or 'CAS_No', just replace data.get('content').get('CID')
 # with data.get('content').get('ingredient') or data.get('content').get('CAS_No').
 
 if __name__ == "__main__":
-    main()
+    main(resume=True)
 
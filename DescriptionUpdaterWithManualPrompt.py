@@ -1,31 +1,34 @@
 import webbrowser
 import logging
-import requests
+import asyncio
 from datetime import datetime
-import concurrent.futures
+import aiohttp
+from ApidScanEngine import DEFAULT_CONCURRENCY, create_session, iter_apids, scan
+from DrugRecordFetcher import AsyncDrugRecordFetcher
 
 
 logging.basicConfig(filename='drug_details.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def fetch_drug_details(apid, field_names, total_apids):
-    api_endpoint = "" 
+API_ENDPOINT = ""
+
+async def fetch_drug_details(record_fetcher, review_lock, apid, field_names, total_apids):
     try:
-        response = requests.get(api_endpoint, params={'APID': apid}, timeout=10)
-        response.raise_for_status()
-        drug_details = response.json().get('content', None)
+        drug_details = await record_fetcher.fetch(apid)
         
       
         if drug_details and 'ingredient' in drug_details and drug_details['ingredient']:
             # Now, check the description field
             description = drug_details.get('description', "Not Found")
             if description in [None, "Not Found", "No description available"]:
-                webbrowser.open(f"https://pubchem.ncbi.nlm.nih.gov/compound/{drug_details.get('CID', 'Not Found')}")
-                webbrowser.open(f"http://link{apid}")
-                input("Press Enter after you have finished reviewing the opened pages...")
+                # Only one manual review at a time; other fetches keep running meanwhile
+                async with review_lock:
+                    webbrowser.open(f"https://pubchem.ncbi.nlm.nih.gov/compound/{drug_details.get('CID', 'Not Found')}")
+                    webbrowser.open(f"http://link{apid}")
+                    await asyncio.to_thread(input, "Press Enter after you have finished reviewing the opened pages...")
         else:
             logging.info(f"Skipping APID: {apid} due to missing or empty 'ingredient'")
             return  
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logging.error(f"Error fetching details for APID: {apid} - {e}")
     
    
@@ -35,13 +38,20 @@ def progress_update(current_apid, total_apids):
     current_index = int(current_apid.replace("A", ""))  
     print(f"Progress: {current_index}/{total_apids} APIDs processed.")
 
-def main(total_apids, field_names):
+async def scan_descriptions(total_apids, field_names, concurrency):
+    review_lock = asyncio.Lock()
+    async with create_session(concurrency) as session:
+        record_fetcher = AsyncDrugRecordFetcher(API_ENDPOINT, session)
+        async for _ in scan(iter_apids(1, total_apids),
+                            lambda apid: fetch_drug_details(record_fetcher, review_lock, apid, field_names, total_apids),
+                            concurrency):
+            pass
+
+def main(total_apids, field_names, concurrency=DEFAULT_CONCURRENCY):
     start_time = datetime.now()
     print("Fetching drug details...")
     
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        future_tasks = [executor.submit(fetch_drug_details, f"A{str(i).zfill(5)}", field_names, total_apids)
-                        for i in range(1, total_apids + 1)]
+    asyncio.run(scan_descriptions(total_apids, field_names, concurrency))
       
     print(f"Completed. Total APIDs processed: {total_apids}.")
     print(f"Total time taken: {datetime.now() - start_time}.")
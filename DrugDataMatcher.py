@@ -1,40 +1,55 @@
-import requests
+import asyncio
+import aiohttp
+import numpy as np
 import pandas as pd
+from ApidScanEngine import DEFAULT_CONCURRENCY, create_session, iter_apids, scan
+from DrugRecordFetcher import AsyncDrugRecordFetcher
 
-def fetch_drug_details(apid):
-   
-    api_endpoint = "api_link"
+API_ENDPOINT = "api_link"
+
+async def fetch_drug_details(record_fetcher, apid):
     try:
-        response = requests.get(api_endpoint, params={'APID': apid})
-        response.raise_for_status()
-        return response.json().get('content', None)
-    except requests.RequestException as e:
+        return await record_fetcher.fetch(apid)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         print(f"Failed to fetch data for APID: {apid} due to: {e}")
         return None
 
-def main():
+async def match_apids(param_index, total_apids, concurrency):
+    # Returns [(apid, row positions in the Excel sheet)] for every APID whose 'param' matches
+    matches = []
+    processed = 0
+    async with create_session(concurrency) as session:
+        record_fetcher = AsyncDrugRecordFetcher(API_ENDPOINT, session)
+        async for apid, drug_details, _ in scan(iter_apids(1, total_apids),
+                                                lambda apid: fetch_drug_details(record_fetcher, apid),
+                                                concurrency):
+            processed += 1
+            if drug_details and isinstance(drug_details.get('param'), str):
+                positions = param_index.get(drug_details['param'])
+                if positions is not None:
+                    matches.append((apid, positions))
+            print(f"Processed APID: {apid} ({processed}/{total_apids})", end='\r')
+    return matches
+
+def main(concurrency=DEFAULT_CONCURRENCY):
     excel_path = "C:/path/to/excel.xlsx"
     new_excel_path = "C:/path/to/new_excel.xlsx"
-    
+
     df_excel = pd.read_excel(excel_path)
-    matched_drugs_info = pd.DataFrame()
+    # parameter -> row positions, built once instead of rescanning the column per APID
+    param_index = df_excel.groupby(df_excel['parameter'].astype(str), sort=False).indices
 
     total_apids = 999
 
     print("Fetching drug details and matching with Excel parameters...")
-    for i in range(1, total_apids + 1):
-        apid = f"A{str(i).zfill(5)}"
-        drug_details = fetch_drug_details(apid)
-        if drug_details and 'param' in drug_details:
-            param = drug_details.get('param')
-            matched_rows = df_excel[df_excel['parameter'].astype(str) == param].copy()
-            if not matched_rows.empty:
-                matched_rows['APID'] = apid
-                matched_drugs_info = pd.concat([matched_drugs_info, matched_rows], ignore_index=True)
-        
-        print(f"Processed APID: {apid} ({i}/{total_apids})", end='\r')
-
-    if not matched_drugs_info.empty:
+    matches = sorted(asyncio.run(match_apids(param_index, total_apids, concurrency)), key=lambda match: match[0])
+
+    if matches:
+        # Assemble all matched rows in one step, in APID order
+        positions = np.concatenate([positions for _, positions in matches])
+        matched_drugs_info = df_excel.iloc[positions].reset_index(drop=True)
+        matched_drugs_info['APID'] = np.repeat([apid for apid, _ in matches],
+                                               [len(positions) for _, positions in matches])
         matched_drugs_info.to_excel(new_excel_path, index=False)
         print(f"\nMatched drug details saved to: {new_excel_path}")
     else:
@@ -1,12 +1,14 @@
 import requests
+from HttpClientFactory import get_session
 import pandas as pd
 import webbrowser
-import pubchempy as pcp
+from PubChemResponseCache import pubchem_cache
+from PubChemBatchProperties import fetch_properties
 
 def fetch_cid(apid):
     api_endpoint = "url"
     try:
-        response = requests.get(api_endpoint, params={'APID': apid})
+        response = get_session().get(api_endpoint, params={'APID': apid})
         response.raise_for_status()
         drug_details = response.json().get('content', None)
         if drug_details and 'CID' in drug_details:
@@ -18,8 +20,9 @@ def fetch_cid(apid):
 
 def fetch_iupac_name(cid):
     try:
-        compound = pcp.Compound.from_cid(cid)
-        return compound.iupac_name
+        url = f'https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/property/IUPACName/JSON'
+        data = pubchem_cache.get_json(url)
+        return data['PropertyTable']['Properties'][0]['IUPACName']
     except Exception as e:
         print(f"Failed to fetch IUPAC name for CID: {cid} due to: {e}")
         return 'Not found'
@@ -43,7 +46,7 @@ def save_api_info(apid, cas, unii, iupac_name):
         "IUPAC_name": iupac_name
     }
     try:
-        response = requests.post(url, json=data)
+        response = get_session().post(url, json=data)
         if response.status_code == 200:
             print(f"APID: {apid} successfully saved to server.")
         else:
@@ -56,23 +59,34 @@ def main():
     results_list = []
 
     print("Fetching details for APIDs...")
+    cids = {}
     for i, row in apid_df.iterrows():
-        apid = row['APID']
-        cid = fetch_cid(apid)
+        cid = fetch_cid(row['APID'])
         if cid:
-            iupac_name = fetch_iupac_name(cid)
-            details = {
-                'CAS': 'Manual Entry Required', 
-                'UNII': 'Manual Entry Required', 
-                'IUPAC_name': iupac_name if iupac_name != 'Not found' else 'Manual Entry Required'
-            }
+            cids[row['APID']] = cid
 
-            details = manual_entry(cid, details)
-            
-            details['APID'] = apid
-            details['CID'] = cid
-            results_list.append(details)
-            save_api_info(apid, details['CAS'], details['UNII'], details['IUPAC_name'])
+    # IUPAC names for all CIDs in a handful of batched PubChem requests
+    try:
+        iupac_names = {cid: props['IUPACName'] for cid, props in
+                       fetch_properties(set(cids.values()), properties=['IUPACName']).items()}
+    except Exception as e:
+        print(f"Batch IUPAC name lookup failed, falling back to per-CID lookups: {e}")
+        iupac_names = {}
+
+    for apid, cid in cids.items():
+        iupac_name = iupac_names.get(cid) or fetch_iupac_name(cid)
+        details = {
+            'CAS': 'Manual Entry Required', 
+            'UNII': 'Manual Entry Required', 
+            'IUPAC_name': iupac_name if iupac_name != 'Not found' else 'Manual Entry Required'
+        }
+
+        details = manual_entry(cid, details)
+        
+        details['APID'] = apid
+        details['CID'] = cid
+        results_list.append(details)
+        save_api_info(apid, details['CAS'], details['UNII'], details['IUPAC_name'])
 
     if results_list:
         print("\nAll APIDs processed successfully.")
@@ -0,0 +1,48 @@
+import asyncio
+from RateLimiter import acquire_async
+
+
+def project_fields(drug_details, field_names):
+    return {field_name: drug_details[field_name] if drug_details and field_name in drug_details else "Not Found"
+            for field_name in field_names}
+
+
+class AsyncDrugRecordFetcher:
+    """
+    Fetch each APID's full 'content' record once and project fields from it,
+    for scans run on ApidScanEngine. Concurrent fetches of the same APID
+    share one request.
+    """
+
+    def __init__(self, api_endpoint, session):
+        self.api_endpoint = api_endpoint
+        self.session = session
+        self._in_flight = {}
+
+    async def _get_record(self, apid):
+        await acquire_async(self.api_endpoint)
+        async with self.session.get(self.api_endpoint, params={'APID': apid}) as response:
+            response.raise_for_status()
+            data = await response.json(content_type=None)
+            return data.get('content', None)
+
+    async def fetch(self, apid):
+        """
+        Return the 'content' record for an APID (None if the API has none).
+        Raises aiohttp.ClientError or asyncio.TimeoutError if the request fails.
+        """
+        task = self._in_flight.get(apid)
+        if task is None:
+            task = asyncio.ensure_future(self._get_record(apid))
+            self._in_flight[apid] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(apid, None))
+        # Shield so one cancelled waiter doesn't cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def fetch_fields(self, apid, field_names):
+        """
+        Return {field_name: value} for the requested fields of one APID record.
+        Fields missing from the record (or a missing record) map to "Not Found".
+        """
+        drug_details = await self.fetch(apid)
+        return project_fields(drug_details, field_names)
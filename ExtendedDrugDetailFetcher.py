@@ -1,18 +1,20 @@
-import concurrent.futures
+import asyncio
 import logging
-import csv
 from datetime import datetime
-import requests
+import aiohttp
+from ApidScanEngine import DEFAULT_CONCURRENCY, create_session, iter_apids, scan
+from DrugRecordFetcher import AsyncDrugRecordFetcher
+from ResultSinks import open_sink
+from ScanCheckpointJournal import DONE, FAILED, CheckpointJournal
 
 logging.basicConfig(filename='drug_details.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def fetch_drug_details(apid, field_names):
-    api_endpoint = 
+API_ENDPOINT = "url"
+
+async def fetch_drug_details(record_fetcher, apid, field_names):
     results = []
     try:
-        response = requests.get(api_endpoint, params={'APID': apid}, timeout=10)
-        response.raise_for_status()
-        drug_details = response.json().get('content', None)
+        drug_details = await record_fetcher.fetch(apid)
         
      
         if drug_details and 'ingredient' in drug_details and drug_details['ingredient']:
@@ -21,7 +23,7 @@ def fetch_drug_details(apid, field_names):
                 results.append((apid, field_name, value))
         else:
             logging.info(f"Skipping APID: {apid} due to missing or empty 'ingredient'")
-    except requests.exceptions.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logging.error(f"Error fetching details for APID: {apid} - {e}")
        
         for field_name in field_names:
@@ -29,31 +31,31 @@ def fetch_drug_details(apid, field_names):
     
     return results
 
-def save_to_csv(data, filename='drug_details.csv'):
-    with open(filename, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        writer.writerow(['APID', 'Field', 'Detail'])
-        writer.writerows(data)
+async def scan_drug_details(total_apids, field_names, concurrency, sink, journal):
+    async with create_session(concurrency) as session:
+        record_fetcher = AsyncDrugRecordFetcher(API_ENDPOINT, session)
+        async for apid, result, error in scan(journal.pending(iter_apids(1, total_apids)),
+                                              lambda apid: fetch_drug_details(record_fetcher, apid, field_names),
+                                              concurrency):
+            if error is None:
+                sink.write_many(result)  
+                for r in result:
+                    print(f"Fetched: {r[0]}, {r[1]}")
+            failed = error is not None or any(r[2] == "Error" for r in result)
+            journal.record(apid, FAILED if failed else DONE, result)
 
-def main(total_apids, field_names):
+def main(total_apids, field_names, concurrency=DEFAULT_CONCURRENCY, output_file='drug_details.csv', resume=False):
     start_time = datetime.now()
     print("Fetching drug details...")
-    results = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        
-        future_tasks = {executor.submit(fetch_drug_details, f"A{str(i).zfill(5)}", field_names)
-                        for i in range(1, total_apids + 1)}
-      
-        for future in concurrent.futures.as_completed(future_tasks):
-            try:
-                result = future.result()
-                results.extend(result)  
-                for r in result:
-                    print(f"Fetched: {r[0]}, {r[1]}")
-            except Exception as exc:
-                logging.error(f"Generated an exception: {exc}")
-    save_to_csv(results)
-    print(f"Completed in {datetime.now() - start_time}. Details saved to drug_details1001.csv.")
+    # Rows are streamed to output_file (.csv, .jsonl or .parquet) as APIDs complete.
+    # resume=True appends to it and skips APIDs the checkpoint journal already marks done; rows
+    # of any other APID (failed, or written just before a crash) are dropped as they are redone.
+    with CheckpointJournal(f"{output_file}.journal.jsonl", resume, autoflush=False) as journal, \
+            open_sink(output_file, ['APID', 'Field', 'Detail'], append=resume,
+                      keep=lambda row: journal.is_done(row[0])) as sink:
+        sink.on_flush = journal.flush
+        asyncio.run(scan_drug_details(total_apids, field_names, concurrency, sink, journal))
+    print(f"Completed in {datetime.now() - start_time}. Details saved to {output_file}.")
 
 if __name__ == "__main__":
     total_apids = 999  
@@ -0,0 +1,77 @@
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from RateLimiter import acquire
+
+# Defaults applied to every pooled client unless overridden
+DEFAULT_TIMEOUT = 10
+DEFAULT_POOL_SIZE = 10
+KEEPALIVE_TIMEOUT = 30
+
+
+class PooledSession(requests.Session):
+    """
+    requests.Session with a sized keep-alive connection pool per host, a
+    default timeout for requests that don't pass one, and the per-host rate
+    limits from RateLimiter applied before every request.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def set_host_pool_size(self, url, pool_size):
+        """
+        Give the scheme://host of url its own pool of up to pool_size connections.
+        """
+        parts = urlsplit(url)
+        self.mount(f"{parts.scheme}://{parts.netloc}", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        acquire(url)
+        return super().request(method, url, **kwargs)
+
+
+_session = None
+_session_lock = threading.Lock()
+_host_pool_sizes = {}
+
+
+def configure_host(url, pool_size):
+    """
+    Set the connection pool size used for url's host by the shared session.
+    """
+    with _session_lock:
+        _host_pool_sizes[url] = pool_size
+        if _session is not None:
+            _session.set_host_pool_size(url, pool_size)
+
+
+def get_session():
+    """
+    Return the process-wide pooled session shared by all blocking HTTP calls.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = PooledSession()
+            for url, pool_size in _host_pool_sizes.items():
+                _session.set_host_pool_size(url, pool_size)
+        return _session
+
+
+def create_async_session(limit=100, limit_per_host=0, timeout=DEFAULT_TIMEOUT):
+    """
+    Open a pooled keep-alive aiohttp session (limit_per_host=0 means no per-host cap).
+    Must be called from inside a running event loop.
+    """
+    import aiohttp
+
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host,
+                                     keepalive_timeout=KEEPALIVE_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout))
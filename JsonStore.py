@@ -0,0 +1,103 @@
+import os
+import json
+import hashlib
+import threading
+
+
+def json_sha256(obj):
+    """
+    Stable SHA-256 of a JSON-serialisable object (keys sorted, so dict order doesn't matter).
+    """
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """
+    Write data as JSON to a temporary file and move it over path, so readers
+    never see a half-written file. Safe to call for the same path from
+    several threads or processes.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **dump_kwargs)
+    os.replace(tmp_path, path)
+
+
+class JsonlLog:
+    """
+    Append-only JSON Lines file of keyed entries, where the latest line for a
+    key wins when the file is loaded.
+
+    key(entry) returns the key of an entry. With resume=False any existing
+    file is discarded. On load, a file holding more than compact_ratio lines
+    per live key is rewritten with only the latest entries. Entries appended
+    with append() are buffered until flush() unless autoflush is set. All
+    methods are thread-safe.
+    """
+
+    def __init__(self, path, key, resume=True, autoflush=True, compact_ratio=2):
+        self.path = path
+        self.key = key
+        self.autoflush = autoflush
+        self.entries = {}
+        self._buffer = []
+        self._lock = threading.Lock()
+        if resume:
+            lines = self._load()
+            if self.entries and lines > compact_ratio * len(self.entries):
+                self._compact()
+        self._file = open(path, mode='a' if resume else 'w', encoding='utf-8')
+        if resume and self._file.tell() > 0 and not self._ends_with_newline():
+            self._file.write('\n')
+
+    def _load(self):
+        lines = 0
+        if not os.path.exists(self.path):
+            return lines
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Partial last line from an interrupted run
+                    continue
+                self.entries[self.key(entry)] = entry
+        return lines
+
+    def _compact(self):
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(entry, ensure_ascii=False) + '\n' for entry in self.entries.values())
+        os.replace(tmp_path, self.path)
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def get(self, key):
+        with self._lock:
+            return self.entries.get(key)
+
+    def append(self, entry):
+        with self._lock:
+            self.entries[self.key(entry)] = entry
+            self._buffer.append(json.dumps(entry, ensure_ascii=False) + '\n')
+            if self.autoflush:
+                self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._file.writelines(self._buffer)
+            self._file.flush()
+            self._buffer = []
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._file.close()
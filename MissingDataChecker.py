@@ -1,56 +1,60 @@
-import concurrent.futures
+import asyncio
 import logging
-import csv
 from datetime import datetime
-import requests
+import aiohttp
+from ApidScanEngine import DEFAULT_CONCURRENCY, create_session, iter_apids, scan
+from DrugRecordFetcher import AsyncDrugRecordFetcher
+from ResultSinks import open_sink
+from ScanCheckpointJournal import DONE, FAILED, CheckpointJournal
 
 logging.basicConfig(filename='missing_drug_details.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-def fetch_drug_detail(apid, field_name):
-    api_endpoint = "url"
+API_ENDPOINT = "url"
+
+async def fetch_drug_details(record_fetcher, apid, field_names):
+    # One request per APID, fanned out to one (APID, Field, Detail) row per field
     try:
-        response = requests.get(api_endpoint, params={'APID': apid}, timeout=10)
-        response.raise_for_status()
-        drug_details = response.json().get('content', None)
-        if drug_details and field_name in drug_details:
-            return apid, field_name, drug_details[field_name] if drug_details[field_name] not in [None, "", []] else "No Data"
-        return apid, field_name, "Not Found"
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Error fetching {field_name} for APID: {apid} - {e}")
-        return apid, field_name, "Error"
-
-def save_to_csv(data, filename='missing_data_drug_details.csv'):
-    with open(filename, mode='w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        writer.writerow(['APID', 'Field', 'Detail'])
-        writer.writerows(data)
-
-def main(total_apids, field_names):
-    start_time = datetime.now()
+        details = await record_fetcher.fetch_fields(apid, field_names)
+        return [(apid, field_name, details[field_name] if details[field_name] not in [None, "", []] else "No Data")
+                for field_name in field_names]
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error(f"Error fetching details for APID: {apid} - {e}")
+        return [(apid, field_name, "Error") for field_name in field_names]
+
+async def scan_missing_data(total_apids, field_names, concurrency, sink, journal):
     total_tasks = total_apids * len(field_names)
     task_counter = 0
-    missing_data_results = []
 
-    print("Fetching drug details...")
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_apid_field = {executor.submit(fetch_drug_detail, f"A{str(i).zfill(5)}", field): (f"A{str(i).zfill(5)}", field)
-                                for i in range(1, total_apids + 1) for field in field_names}
-        
-        for future in concurrent.futures.as_completed(future_to_apid_field):
-            task_counter += 1
-            apid, field = future_to_apid_field[future]
-            try:
-                apid, field, detail = future.result()
-                print(f"Progress: {task_counter}/{total_tasks} tasks completed.", end='\r')
+    async with create_session(concurrency) as session:
+        record_fetcher = AsyncDrugRecordFetcher(API_ENDPOINT, session)
+        async for apid, rows, error in scan(journal.pending(iter_apids(1, total_apids)),
+                                            lambda apid: fetch_drug_details(record_fetcher, apid, field_names),
+                                            concurrency):
+            if error is not None:
+                rows = [(apid, field, "Error") for field in field_names]
+            for apid, field, detail in rows:
+                task_counter += 1
                 if detail in ["No Data", "Not Found", "Error"]:
-                    missing_data_results.append((apid, field, detail))
-            except Exception as exc:
-                logging.error(f"{apid}, {field} generated an exception: {exc}")
-                missing_data_results.append((apid, field, "Error"))
+                    sink.write((apid, field, detail))
+            journal.record(apid, FAILED if any(r[2] == "Error" for r in rows) else DONE, rows)
+            print(f"Progress: {task_counter}/{total_tasks} tasks completed.", end='\r')
+
+def main(total_apids, field_names, concurrency=DEFAULT_CONCURRENCY, output_file='missing_data_drug_details.csv',
+         resume=False):
+    start_time = datetime.now()
+
+    print("Fetching drug details...")
+    # Rows are streamed to output_file (.csv, .jsonl or .parquet) as APIDs complete.
+    # resume=True appends to it and skips APIDs the checkpoint journal already marks done; rows
+    # of any other APID (failed, or written just before a crash) are dropped as they are redone.
+    with CheckpointJournal(f"{output_file}.journal.jsonl", resume, autoflush=False) as journal, \
+            open_sink(output_file, ['APID', 'Field', 'Detail'], append=resume,
+                      keep=lambda row: journal.is_done(row[0])) as sink:
+        sink.on_flush = journal.flush
+        asyncio.run(scan_missing_data(total_apids, field_names, concurrency, sink, journal))
 
-    save_to_csv(missing_data_results)
-    print(f"\nCompleted in {datetime.now() - start_time}. Missing data details saved to {filename}.")
+    print(f"\nCompleted in {datetime.now() - start_time}. Missing data details saved to {output_file}.")
 
 if __name__ == "__main__":
     total_apids = 999
@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import Future
+from PubChemResponseCache import pubchem_cache
+
+PROPERTY_URL = "https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cids}/property/{properties}/JSON"
+PROPERTIES = ['IUPACName', 'MolecularFormula', 'MolecularWeight', 'IsomericSMILES']
+DEFAULT_CHUNK_SIZE = 100
+
+
+class PropertyBatcher:
+    """
+    Collect CIDs from per-APID callers and fetch their properties from the
+    PUG REST property table, chunk_size CIDs per request.
+
+    request(cid) returns a Future that resolves to {property: value} for that
+    CID once its chunk has been fetched. A chunk is sent as soon as it is full;
+    call flush() to send whatever is still pending.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, properties=PROPERTIES):
+        self.chunk_size = chunk_size
+        self.properties = properties
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _take_chunk(self):
+        cids = list(self._pending)[:self.chunk_size]
+        return {cid: self._pending.pop(cid) for cid in cids}
+
+    def _fetch_chunk(self, chunk):
+        url = PROPERTY_URL.format(cids=','.join(str(cid) for cid in chunk),
+                                  properties=','.join(self.properties))
+        try:
+            rows = pubchem_cache.get_json(url).get('PropertyTable', {}).get('Properties', [])
+        except Exception as e:
+            for future in chunk.values():
+                future.set_exception(e)
+            return
+
+        by_cid = {row.get('CID'): row for row in rows}
+        for cid, future in chunk.items():
+            row = by_cid.get(int(cid), {})
+            # PubChem now returns IsomericSMILES under the name SMILES
+            if 'IsomericSMILES' in self.properties and 'IsomericSMILES' not in row and 'SMILES' in row:
+                row['IsomericSMILES'] = row['SMILES']
+            future.set_result({prop: row.get(prop) for prop in self.properties})
+
+    def request(self, cid):
+        """
+        Queue a CID and return a Future for its properties.
+        """
+        chunk = None
+        with self._lock:
+            future = self._pending.get(cid)
+            if future is None:
+                future = Future()
+                self._pending[cid] = future
+                if len(self._pending) >= self.chunk_size:
+                    chunk = self._take_chunk()
+        if chunk:
+            self._fetch_chunk(chunk)
+        return future
+
+    def flush(self):
+        """
+        Fetch every CID that is still waiting for a full chunk.
+        """
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                chunk = self._take_chunk()
+            self._fetch_chunk(chunk)
+
+
+def fetch_properties(cids, chunk_size=DEFAULT_CHUNK_SIZE, properties=PROPERTIES):
+    """
+    Return {cid: {property: value}} for all cids, chunk_size CIDs per request.
+    Raises requests.RequestException if a chunk can't be fetched.
+    """
+    batcher = PropertyBatcher(chunk_size, properties)
+    futures = {cid: batcher.request(cid) for cid in cids}
+    batcher.flush()
+    return {cid: future.result() for cid, future in futures.items()}
+
+
+def get_compound_details_for_apids(compounds, get_cid_by_name, get_compound_details, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Return {apid: details} for (name, APID) pairs. Each name is resolved to a
+    CID once with get_cid_by_name(name), the properties of all CIDs are
+    fetched chunk_size per request, and details come from
+    get_compound_details(name, apid, properties, cid). Names without a CID
+    map to None.
+    """
+    cids = {apid: get_cid_by_name(name) for name, apid in compounds}
+    properties = fetch_properties({cid for cid in cids.values() if cid}, chunk_size)
+    return {apid: get_compound_details(name, apid, properties[cids[apid]], cids[apid]) if cids[apid] else None
+            for name, apid in compounds}
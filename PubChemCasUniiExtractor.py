@@ -0,0 +1,116 @@
+import requests
+from PubChemResponseCache import pubchem_cache
+
+PUG_VIEW_URL = "https://pubchem.ncbi.nlm.nih.gov/rest/pug_view/data/compound/{cid}/JSON"
+HEADINGS = ('CAS', 'UNII')
+
+# Keys for nested sections; older PUG-View output used Sections/Subsections
+SECTION_KEYS = ('Section', 'Sections', 'Subsections')
+SECTION_ITEM_PREFIXES = tuple(f"{section_key}.item" for section_key in SECTION_KEYS)
+
+
+def _information_string(information):
+    if information.get('ValueString'):
+        return information['ValueString']
+    markup = information.get('Value', {}).get('StringWithMarkup', [])
+    return markup[0].get('String') if markup else None
+
+
+def _matches(key, heading, name):
+    return heading == key or key in (name or '')
+
+
+def _walk(section, found):
+    heading = section.get('TOCHeading')
+    for information in section.get('Information', []):
+        value = _information_string(information)
+        for key in HEADINGS:
+            if key not in found and value and _matches(key, heading, information.get('Name')):
+                found[key] = value
+    for section_key in SECTION_KEYS:
+        for child in section.get(section_key, []):
+            _walk(child, found)
+
+
+def extract_cas_unii(record):
+    """
+    Return (cas, unii) from a parsed PUG-View record; either is None if absent.
+    """
+    found = {}
+    _walk(record.get('Record', {}), found)
+    return found.get('CAS'), found.get('UNII')
+
+
+def stream_cas_unii(cid):
+    """
+    Read the full PUG-View record (cached on disk) with a streaming parser and
+    stop as soon as both CAS and UNII have been seen. Falls back to a regular
+    parse of the cached record if ijson isn't installed.
+    """
+    url = PUG_VIEW_URL.format(cid=cid)
+    try:
+        import ijson
+    except ImportError:
+        return extract_cas_unii(pubchem_cache.get_json(url))
+
+    with open(pubchem_cache.get_file(url), 'rb') as f:
+        return _scan_events(ijson.parse(f))
+
+
+def _scan_events(events):
+    # Consume ijson (prefix, event, value) events until both values are found
+    found = {}
+    headings = []  # TOCHeading of each enclosing section, innermost last
+    name = None
+    for prefix, event, value in events:
+        if event == 'start_map' and prefix.endswith(SECTION_ITEM_PREFIXES):
+            headings.append(None)
+        elif event == 'end_map' and prefix.endswith(SECTION_ITEM_PREFIXES):
+            headings.pop()
+        elif prefix.endswith('.TOCHeading') and headings:
+            headings[-1] = value
+        elif prefix.endswith('.Information.item.Name'):
+            name = value
+        elif event == 'end_map' and prefix.endswith('.Information.item'):
+            name = None
+        elif event == 'string' and prefix.endswith(('.ValueString', '.StringWithMarkup.item.String')):
+            heading = headings[-1] if headings else None
+            for key in HEADINGS:
+                if key not in found and _matches(key, heading, name):
+                    found[key] = value
+            if len(found) == len(HEADINGS):
+                break
+    return found.get('CAS'), found.get('UNII')
+
+
+def fetch_cas_unii(cid):
+    """
+    Return (cas, unii) for a CID; either is None if PubChem has no value.
+
+    Requests only the CAS and UNII headings of the PUG-View record (each
+    cached on disk) and falls back to streaming the full record only if a
+    heading request fails or comes back without a value.
+    Raises requests.RequestException if the fallback fetch fails.
+    """
+    values = {}
+    needs_full_record = False
+    for heading in HEADINGS:
+        try:
+            record = pubchem_cache.get_json(PUG_VIEW_URL.format(cid=cid), params={'heading': heading})
+        except requests.HTTPError as e:
+            # 404: the compound has no such heading, so the full record won't have it either
+            if e.response is None or e.response.status_code != 404:
+                needs_full_record = True
+            continue
+        except requests.RequestException:
+            needs_full_record = True
+            continue
+        values[heading] = extract_cas_unii(record)[HEADINGS.index(heading)]
+        if values[heading] is None:
+            needs_full_record = True
+
+    if needs_full_record:
+        cas, unii = stream_cas_unii(cid)
+        values['CAS'] = values.get('CAS') or cas
+        values['UNII'] = values.get('UNII') or unii
+    return values.get('CAS'), values.get('UNII')
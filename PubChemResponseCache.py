@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from urllib.parse import urlencode
+import requests
+from HttpClientFactory import get_session
+from JsonStore import write_json_atomic
+
+# Compound records rarely change, so entries stay fresh for a long time
+CACHE_DIR = "./pubchem_cache"
+DEFAULT_TTL = 30 * 24 * 3600  # 30 days
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+
+
+class PubChemResponseCache:
+    """
+    Persistent on-disk cache for PubChem PUG REST / PUG-View JSON responses.
+
+    Entries are stored under a SHA-256 of the URL and query parameters. Fresh
+    entries (younger than ttl) are served from disk; stale ones are revalidated
+    with If-None-Match / If-Modified-Since when the server sent an ETag or
+    Last-Modified. If the server can't be reached, a stale entry is served
+    with a warning instead of failing. The least recently used entries are
+    evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stale = 0
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, url, params):
+        key_source = url if not params else f"{url}?{urlencode(sorted(params.items()))}"
+        key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load_meta(self, path):
+        # Entry fields written before 'body', read without parsing the (possibly large) body
+        import ijson
+        meta = {}
+        try:
+            with open(path, 'rb') as f:
+                for prefix, event, value in ijson.parse(f):
+                    if prefix == '' and event == 'map_key' and value == 'body':
+                        return meta
+                    if prefix in ('etag', 'last_modified', 'stored_at') and event in ('string', 'number', 'null'):
+                        meta[prefix] = float(value) if event == 'number' else value
+        except (OSError, ijson.JSONError):
+            pass
+        return None
+
+    def _store(self, path, entry):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        write_json_atomic(path, entry, ensure_ascii=False)
+        self._stored(path, old_size)
+
+    def _store_stream(self, path, meta, response):
+        # Write an entry whose body is copied from the response as it downloads
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(json.dumps(meta, ensure_ascii=False)[:-1].encode('utf-8') + b', "body": ')
+                response.raw.decode_content = True
+                shutil.copyfileobj(response.raw, f)
+                f.write(b'}')
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._stored(path, old_size)
+
+    def _stored(self, path, old_size):
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += os.path.getsize(path) - old_size
+        self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _evict(self):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            if self._total_bytes <= self.max_bytes:
+                return
+            # mtime is bumped on every hit, so oldest mtime == least recently used
+            for path, size, _ in sorted(self._entries(), key=lambda entry: entry[2]):
+                if self._total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    self._total_bytes -= size
+                except OSError:
+                    continue
+
+    def get_json(self, url, params=None):
+        """
+        Return the parsed JSON body for url, from disk when possible.
+        Raises requests.RequestException (including HTTPError for 4xx/5xx) on a failed fetch,
+        unless it is a connection error or timeout and a stale entry can be returned instead.
+        """
+        path = self._path(url, params)
+        entry = self._load(path)
+
+        if entry and time.time() - entry['stored_at'] < self.ttl:
+            with self._lock:
+                self.hits += 1
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return entry['body']
+
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            response = get_session().get(url, params=params, headers=headers)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if not entry:
+                raise
+            logging.warning(f"Serving stale cached response for {url}: revalidation failed: {e}")
+            with self._lock:
+                self.stale += 1
+            return entry['body']
+        if entry and response.status_code == 304:
+            with self._lock:
+                self.revalidated += 1
+            entry['stored_at'] = time.time()
+            self._store(path, entry)
+            return entry['body']
+
+        with self._lock:
+            self.misses += 1
+        response.raise_for_status()
+        body = response.json()
+        self._store(path, {
+            'url': url,
+            'params': params,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'stored_at': time.time(),
+            'body': body
+        })
+        return body
+
+    def get_file(self, url, params=None):
+        """
+        Like get_json, but return the path of the cache entry file instead of
+        the parsed body, for responses too large to parse in one go. The entry
+        is a JSON object with the response under its 'body' key (e.g. parse it
+        with ijson and prefix 'body'). On a miss the response is streamed
+        straight to disk. Requires ijson.
+        """
+        path = self._path(url, params)
+        meta = self._load_meta(path)
+
+        if meta and time.time() - meta['stored_at'] < self.ttl:
+            with self._lock:
+                self.hits += 1
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return path
+
+        headers = {}
+        if meta and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            response = get_session().get(url, params=params, headers=headers, stream=True)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if not meta:
+                raise
+            logging.warning(f"Serving stale cached response for {url}: revalidation failed: {e}")
+            with self._lock:
+                self.stale += 1
+            return path
+
+        with response:
+            if meta and response.status_code == 304:
+                with self._lock:
+                    self.revalidated += 1
+                # Rare (once per ttl), so the entry is simply rewritten in full
+                entry = self._load(path)
+                entry['stored_at'] = time.time()
+                self._store(path, entry)
+                return path
+
+            with self._lock:
+                self.misses += 1
+            response.raise_for_status()
+            self._store_stream(path, {
+                'url': url,
+                'params': params,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'stored_at': time.time()
+            }, response)
+        return path
+
+    def stats(self):
+        """
+        Return the hit / miss / revalidation / stale counters.
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'revalidated': self.revalidated, 'stale': self.stale}
+
+    def log_stats(self):
+        stats = self.stats()
+        logging.info(f"PubChem cache: {stats['hits']} hits, {stats['misses']} misses, "
+                     f"{stats['revalidated']} revalidated, {stats['stale']} served stale")
+
+
+# Shared cache used by the PubChem lookup helpers
+pubchem_cache = PubChemResponseCache()
@@ -0,0 +1,93 @@
+import time
+import asyncio
+import threading
+from urllib.parse import urlsplit
+
+# Per-host limits as (requests per second, burst). PubChem's usage policy
+# allows at most 5 requests per second per user.
+HOST_RATE_LIMITS = {
+    'pubchem.ncbi.nlm.nih.gov': (5, 5),
+}
+
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` acquisitions per second with bursts of up to `burst`.
+    Callers only wait when they would exceed the rate.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        # Take a token (possibly borrowing against the future) and return how long to wait for it
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _host(url):
+    # Accept either a full URL or a bare host name
+    return urlsplit(url).netloc if '://' in url else url
+
+
+def configure_rate_limit(url, rate, burst=None):
+    """
+    Limit requests to url's host to `rate` per second (burst defaults to rate).
+    """
+    host = _host(url)
+    if not host:
+        return
+    with _limiters_lock:
+        _limiters[host] = TokenBucket(rate, burst or max(1, int(rate)))
+
+
+def get_limiter(url):
+    """
+    Return the TokenBucket for url's host, or None if the host is unlimited.
+    """
+    host = _host(url)
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None and host in HOST_RATE_LIMITS:
+            limiter = _limiters[host] = TokenBucket(*HOST_RATE_LIMITS[host])
+        return limiter
+
+
+def acquire(url):
+    """
+    Block until a request to url's host is allowed.
+    """
+    limiter = get_limiter(url)
+    if limiter:
+        limiter.acquire()
+
+
+async def acquire_async(url):
+    """
+    Wait (without blocking the event loop) until a request to url's host is allowed.
+    """
+    limiter = get_limiter(url)
+    if limiter:
+        await limiter.acquire_async()
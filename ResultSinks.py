@@ -0,0 +1,186 @@
+import os
+import csv
+import json
+import time
+
+DEFAULT_FLUSH_EVERY = 500  # rows
+DEFAULT_FLUSH_INTERVAL = 5.0  # seconds
+
+
+class ResultSink:
+    """
+    Write result rows to a file as they are produced instead of collecting
+    them all in memory.
+
+    Rows are buffered and flushed to disk every flush_every rows or every
+    flush_interval seconds, whichever comes first, so a crash loses at most
+    one buffer. Use as a context manager so the final buffer is flushed.
+    on_flush, if set, is called after every flush (e.g. to commit checkpoints
+    for the rows just written).
+
+    When appending, keep(row), if given, selects which rows already in the
+    file are kept; the others are removed before new rows are written (e.g.
+    rows of items a resumed scan is about to write again).
+    """
+
+    def __init__(self, filename, fieldnames, flush_every=DEFAULT_FLUSH_EVERY,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, append=False, keep=None):
+        self.filename = filename
+        self.fieldnames = list(fieldnames)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.append = append
+        self.rows_written = 0
+        self.on_flush = None
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        if append and keep is not None and os.path.exists(filename):
+            self._prune(keep)
+
+    def _prune(self, keep):
+        # Only sinks that can append (and so define _copy_rows) get here
+        tmp_filename = f"{self.filename}.{os.getpid()}.tmp"
+        try:
+            with open(self.filename, 'r', newline='', encoding='utf-8') as src, \
+                    open(tmp_filename, 'w', newline='', encoding='utf-8') as dst:
+                self._copy_rows(src, dst, keep)
+            os.replace(tmp_filename, self.filename)
+        finally:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+
+    def write(self, row):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        if self._buffer:
+            self._write_rows(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+        self._last_flush = time.monotonic()
+        if self.on_flush:
+            self.on_flush()
+
+    def close(self):
+        self.flush()
+        self._close()
+
+    def _write_rows(self, rows):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CsvSink(ResultSink):
+    """
+    CSV sink with a header row; appending to an existing file keeps its header.
+    """
+
+    def __init__(self, filename, fieldnames, **kwargs):
+        super().__init__(filename, fieldnames, **kwargs)
+        write_header = not (self.append and os.path.exists(filename) and os.path.getsize(filename) > 0)
+        self._file = open(filename, mode='a' if self.append else 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        if write_header:
+            self._writer.writerow(self.fieldnames)
+            self._file.flush()
+
+    def _write_rows(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _copy_rows(self, src, dst, keep):
+        reader = csv.reader(src)
+        writer = csv.writer(dst)
+        header = next(reader, None)
+        if header:
+            writer.writerow(header)
+        writer.writerows(row for row in reader if keep(row))
+
+    def _close(self):
+        self._file.close()
+
+
+class JsonlSink(ResultSink):
+    """
+    JSON Lines sink: one {fieldname: value} object per row.
+    """
+
+    def __init__(self, filename, fieldnames, **kwargs):
+        super().__init__(filename, fieldnames, **kwargs)
+        self._file = open(filename, mode='a' if self.append else 'w', encoding='utf-8')
+
+    def _write_rows(self, rows):
+        for row in rows:
+            self._file.write(json.dumps(dict(zip(self.fieldnames, row)), ensure_ascii=False, default=str) + '\n')
+        self._file.flush()
+
+    def _copy_rows(self, src, dst, keep):
+        for line in src:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Partial last line from an interrupted run
+                continue
+            if keep(tuple(record.get(name) for name in self.fieldnames)):
+                dst.write(line)
+
+    def _close(self):
+        self._file.close()
+
+
+class ParquetSink(ResultSink):
+    """
+    Parquet sink writing one row group per flush. All columns are stored as
+    strings. Requires pyarrow; Parquet files can't be appended to.
+    """
+
+    def __init__(self, filename, fieldnames, **kwargs):
+        if kwargs.get('append'):
+            raise ValueError("ParquetSink does not support appending to an existing file")
+        super().__init__(filename, fieldnames, **kwargs)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("ParquetSink requires pyarrow: pip install pyarrow")
+        self._pa = pa
+        self._schema = pa.schema([(name, pa.string()) for name in self.fieldnames])
+        self._writer = pq.ParquetWriter(filename, self._schema)
+
+    def _write_rows(self, rows):
+        columns = [[None if value is None else str(value) for value in column] for column in zip(*rows)]
+        self._writer.write_table(self._pa.Table.from_arrays(columns, schema=self._schema))
+
+    def _close(self):
+        self._writer.close()
+
+
+SINKS_BY_EXTENSION = {
+    '.csv': CsvSink,
+    '.jsonl': JsonlSink,
+    '.parquet': ParquetSink,
+}
+
+
+def open_sink(filename, fieldnames, **kwargs):
+    """
+    Open the sink matching filename's extension (.csv, .jsonl or .parquet).
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in SINKS_BY_EXTENSION:
+        raise ValueError(f"Unsupported result file type: {filename}")
+    return SINKS_BY_EXTENSION[extension](filename, fieldnames, **kwargs)
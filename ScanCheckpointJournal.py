@@ -0,0 +1,62 @@
+from datetime import datetime
+from JsonStore import JsonlLog, json_sha256
+
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+class CheckpointJournal:
+    """
+    Append-only JSON Lines journal of per-APID scan status.
+
+    Each record() appends {"APID", "status", "hash", "time"}; the latest line
+    for an APID wins when the journal is loaded. With resume=True the existing
+    journal is kept and pending() skips APIDs already marked done or skipped,
+    so only failed or never-attempted APIDs are processed again; otherwise
+    the journal starts empty.
+
+    With autoflush=False records are held in memory until flush() is called,
+    which lets a scan tie its checkpoints to a ResultSink's flushes so an APID
+    is never marked done before its rows are on disk.
+    """
+
+    def __init__(self, path, resume=False, autoflush=True):
+        self.path = path
+        self._log = JsonlLog(path, key=lambda entry: entry['APID'], resume=resume, autoflush=autoflush)
+
+    def record(self, apid, status, result=None):
+        self._log.append({
+            'APID': apid,
+            'status': status,
+            'hash': json_sha256(result) if result is not None else None,
+            'time': datetime.now().isoformat(timespec='seconds')
+        })
+
+    def flush(self):
+        self._log.flush()
+
+    def status(self, apid):
+        entry = self._log.get(apid)
+        return entry['status'] if entry else None
+
+    def is_done(self, apid):
+        # Skipped APIDs (e.g. with no record to process) are finished too
+        return self.status(apid) in (DONE, SKIPPED)
+
+    def pending(self, apids):
+        """
+        Lazily yield the APIDs from apids that are not yet done or skipped.
+        """
+        for apid in apids:
+            if not self.is_done(apid):
+                yield apid
+
+    def close(self):
+        self._log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,5 +1,10 @@
+import os
+import json
 import logging
+import concurrent.futures
 import requests
+from HttpClientFactory import configure_host, get_session
+from JsonStore import write_json_atomic
 import pandas as pd
 from tqdm import tqdm
 
@@ -8,61 +13,101 @@ logging.basicConfig(level=logging.DEBUG)
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
-def get_code(ingredient):
-    api_url = 
+API_URL = ""
+FILE_PATH = ""
+OUTPUT_PATH = ""
+
+# Persistent memo of XandaNER lookups (text -> code info, or null for no match)
+CODE_CACHE_FILE = "xui_code_cache.json"
+MAX_WORKERS = 16
+CACHE_SAVE_EVERY = 500
+
+# One pooled connection per lookup thread, so none are opened and discarded
+if API_URL:
+    configure_host(API_URL, MAX_WORKERS)
+
+def lookup_code(ingredient):
+    # Raises requests.RequestException on failure; returns None if XandaNER has no match
     payload = {
         "model_name": "XandaNER",
         "text": ingredient
     }
+    response = get_session().post(API_URL, json=payload)
+    response.raise_for_status()
+    data = response.json()
+    if data.get('api_status') == 'success' and len(data.get('content', [])) > 0:
+        info = data['content'][0]['label']
+        return {
+            'code': info.get('code'),
+            'type': info.get('type'),
+            'XUI': info.get('XUI')
+        }
+    return None
+
+def get_code(ingredient):
     try:
-        response = requests.post(api_url, json=payload)
-        response.raise_for_status()
-        data = response.json()
-        if data.get('api_status') == 'success' and len(data.get('content', [])) > 0:
-            info = data['content'][0]['label']
-            return {
-                'code': info.get('code'),
-                'type': info.get('type'),
-                'XUI': info.get('XUI')
-            }
+        return lookup_code(ingredient)
     except requests.RequestException as e:
         logger.error(f"Error getting code for ingredient {ingredient}: {e}")
     return None
 
-
-file_path = 
-output_path = 
-
-
-df = pd.read_excel(file_path)
-
-
-results_df = pd.DataFrame(columns=['APID', 'Detail', 'XUI_Code', 'XUI_Type', 'XUI'])
-
-
-for _, row in tqdm(df.iterrows(), desc="Extracting XUIs", total=df.shape[0]):
-    apid = row['APID']
-    detail = row['Detail']
-    if pd.notna(detail):
-        xui_info = get_code(detail)
-        if xui_info:  
-            results_df = results_df.append({
-                'APID': apid,
-                'Detail': detail,
-                'XUI_Code': xui_info.get('code'),
-                'XUI_Type': xui_info.get('type'),
-                'XUI': xui_info.get('XUI')
-            }, ignore_index=True)
-
-
-results_df.to_excel(output_path, index=False)
-
-print(f'Extracted XUIs are written to {output_path}')
-
-
-
-# test
-test_ingredient = "Amfepramone"
-result = get_code(test_ingredient)
-
-print(f"Result for '{test_ingredient}': {result}")
+def load_code_cache(cache_file=CODE_CACHE_FILE):
+    if not os.path.exists(cache_file):
+        return {}
+    with open(cache_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_code_cache(cache, cache_file=CODE_CACHE_FILE):
+    write_json_atomic(cache_file, cache, ensure_ascii=False)
+
+def get_codes(texts, cache_file=CODE_CACHE_FILE, max_workers=MAX_WORKERS):
+    """
+    Look up each distinct text once, concurrently, reusing results memoised in
+    cache_file from earlier runs. Returns {text: code info or None}; texts whose
+    lookup failed are left out (and not cached) so they are retried next run.
+    """
+    cache = load_code_cache(cache_file)
+    missing = [text for text in dict.fromkeys(texts) if text not in cache]
+    logger.info(f"{len(cache)} cached lookups, {len(missing)} new texts to look up")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_text = {executor.submit(lookup_code, text): text for text in missing}
+        for count, future in enumerate(tqdm(concurrent.futures.as_completed(future_to_text),
+                                            desc="Extracting XUIs", total=len(missing)), 1):
+            text = future_to_text[future]
+            try:
+                cache[text] = future.result()
+            except requests.RequestException as e:
+                logger.error(f"Error getting code for ingredient {text}: {e}")
+            if count % CACHE_SAVE_EVERY == 0:
+                save_code_cache(cache, cache_file)
+
+    save_code_cache(cache, cache_file)
+    return {text: cache[text] for text in texts if text in cache}
+
+def main():
+    df = pd.read_excel(FILE_PATH)
+
+    rows = df.loc[df['Detail'].notna(), ['APID', 'Detail']]
+    rows = rows.assign(text=rows['Detail'].astype(str))
+    codes = get_codes(rows['text'].unique().tolist())
+
+    codes_df = pd.DataFrame(
+        [(text, info.get('code'), info.get('type'), info.get('XUI')) for text, info in codes.items() if info],
+        columns=['text', 'XUI_Code', 'XUI_Type', 'XUI']
+    )
+    # Inner merge keeps only rows with a match, in the sheet's row order
+    results_df = rows.merge(codes_df, on='text', how='inner').drop(columns='text')
+
+    results_df.to_excel(OUTPUT_PATH, index=False)
+
+    print(f'Extracted XUIs are written to {OUTPUT_PATH}')
+
+if __name__ == "__main__":
+    main()
+
+    # test
+    test_ingredient = "Amfepramone"
+    result = get_code(test_ingredient)
+
+    print(f"Result for '{test_ingredient}': {result}")
@@ -1,9 +1,16 @@
-import requests
+from HttpClientFactory import configure_host, get_session
+from RateLimiter import configure_rate_limit
+from dashscope_file_cache import dashscope_file_cache, file_sha256
+from processing_manifest import MANIFEST_FILE, ProcessingManifest, text_sha256
+from post_ledger import LEDGER_FILE, PostLedger
 from openai import OpenAI
 from datetime import datetime
 import os
 import json
-import time
+import queue
+import concurrent.futures
+import functools
+import threading
 from typing import Dict, Any, Optional, List
 from pathlib import Path
 
@@ -12,9 +19,26 @@ LOCAL_PDF_DIR = "./extracted_pde_docs"
 OUTPUT_DIR = "./extracted_pde_results"
 API_KEY = ""
 API_URL = ""
+# Endpoint accepting a JSON list of all sections of a file in one request; leave empty to post sections one by one
+BULK_API_URL = ""
+API_RATE_LIMIT = 10  # Max requests per second to API_URL
+MODEL = "qwen-long"
+STREAM_RESPONSES = True  # Parse sections as the response streams in instead of waiting for all of it
+
+# Workers per pipeline stage; each stage hands files to the next through a bounded queue
+UPLOAD_WORKERS = 4
+EXTRACT_WORKERS = 8
+SAVE_WORKERS = 2
+POST_WORKERS = 4
+STAGE_QUEUE_SIZE = 16
+SECTION_POST_WORKERS = 8  # Concurrent section posts per file, still bounded by API_RATE_LIMIT
 
 # Init directories
 os.makedirs(OUTPUT_DIR, exist_ok=True)
+configure_rate_limit(API_URL, API_RATE_LIMIT)
+configure_rate_limit(BULK_API_URL, API_RATE_LIMIT)
+if API_URL:
+    configure_host(API_URL, SECTION_POST_WORKERS * POST_WORKERS)
 client = OpenAI(
     api_key=API_KEY,
     base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
@@ -24,6 +48,10 @@ class ProcessingError(Exception):
     """Custom exception for processing errors"""
     pass
 
+class PartialSections(dict):
+    """Sections salvaged from a response whose remainder could not be parsed"""
+    pass
+
 def get_pdf_files() -> List[str]:
     # Get all PDF files in the directory
     if not os.path.exists(LOCAL_PDF_DIR):
@@ -35,7 +63,7 @@ def get_pdf_files() -> List[str]:
     
     return pdf_files
 
-def process_pdf_files():
+def process_pdf_files(post_results: bool = False, force: bool = False):
     # Start processing all PDFs
     print(f"\nStart processing PDFs - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
@@ -43,22 +71,32 @@ def process_pdf_files():
         pdf_files = get_pdf_files()
         print(f"Found {len(pdf_files)} PDF files to process")
         
-        results = []
-        for pdf_file in pdf_files:
-            try:
-                # Process each PDF, track result
-                result = process_single_file(pdf_file)
-                results.append({
-                    "file": pdf_file,
-                    "status": "success" if result else "failed"
-                })
-            except Exception as e:
-                # Record error if something goes wrong
-                results.append({
-                    "file": pdf_file,
-                    "status": "failed",
-                    "error": str(e)
-                })
+        # Input / prompt / model behind each extracted JSON, to skip unchanged PDFs on the next run
+        manifest = ProcessingManifest(os.path.join(OUTPUT_DIR, MANIFEST_FILE))
+        
+        # Only new or changed PDFs (or a changed prompt / model) are processed unless forced
+        if not force:
+            total_files = len(pdf_files)
+            pdf_files = [pdf_file for pdf_file in pdf_files if not is_unchanged(pdf_file, manifest)]
+            print(f"Skipping {total_files - len(pdf_files)} unchanged PDF files")
+        
+        save = functools.partial(save_stage, manifest=manifest)
+        if post_results:
+            # Hash of the last successfully posted content of each (APID, section_name), so unchanged
+            # sections aren't re-posted; the executor posts sections as soon as they are extracted
+            with PostLedger(os.path.join(OUTPUT_DIR, LEDGER_FILE)) as post_ledger, \
+                    concurrent.futures.ThreadPoolExecutor(max_workers=SECTION_POST_WORKERS * POST_WORKERS) as section_post_executor:
+                # Sections are posted while the rest of the response is still streaming in
+                stages = [(upload_stage, UPLOAD_WORKERS),
+                          (functools.partial(extract_and_post_stage, post_ledger=post_ledger,
+                                             section_post_executor=section_post_executor), EXTRACT_WORKERS),
+                          (save, SAVE_WORKERS),
+                          (functools.partial(post_stage, post_ledger=post_ledger), POST_WORKERS)]
+                results = run_pipeline(pdf_files, stages)
+        else:
+            stages = [(upload_stage, UPLOAD_WORKERS), (extract_stage, EXTRACT_WORKERS), (save, SAVE_WORKERS)]
+            # Process PDFs through the stage pipeline, one result per file in the original order
+            results = run_pipeline(pdf_files, stages)
         
         # Print summary of results
         print("\nSummary of processing results:")
@@ -82,29 +120,131 @@ def process_pdf_files():
     
     print(f"\nFinished processing - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
-def process_single_file(pdf_file: str) -> bool:
-    # Process a single PDF file
-    local_file_path = os.path.join(LOCAL_PDF_DIR, pdf_file)
-    print(f"\nProcessing file: {pdf_file}")
+_STAGE_DONE = object()  # Queue sentinel: no more jobs for this stage
 
+def run_pipeline(pdf_files: List[str], stages: List[tuple]) -> List[Dict[str, Any]]:
+    # Run each file through the stages, with the given number of worker threads per stage.
+    # A job that raises in any stage is reported as failed and goes no further.
+    results = {}
+    results_lock = threading.Lock()
+    
+    def record(job: Dict[str, Any], error: Optional[Exception] = None):
+        result = {"file": job["file"], "status": "success" if error is None else "failed"}
+        if error is not None:
+            print(f"Error processing file {job['file']}: {str(error)}")
+            result["error"] = str(error)
+        with results_lock:
+            results[job["file"]] = result
+    
+    def worker(stage, in_queue, out_queue):
+        while True:
+            job = in_queue.get()
+            if job is _STAGE_DONE:
+                return
+            try:
+                stage(job)
+            except Exception as e:
+                record(job, e)
+                continue
+            if out_queue is None:
+                record(job)
+            else:
+                out_queue.put(job)
+    
+    queues = [queue.Queue(maxsize=STAGE_QUEUE_SIZE) for _ in stages] + [None]
+    stage_threads = []
+    for i, (stage, workers) in enumerate(stages):
+        threads = [threading.Thread(target=worker, args=(stage, queues[i], queues[i + 1]), daemon=True)
+                   for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        stage_threads.append(threads)
+    
+    for pdf_file in pdf_files:
+        queues[0].put({"file": pdf_file})
+    
+    # Shut stages down in order: once a stage's workers have exited, nothing more can reach the next one
+    for i, threads in enumerate(stage_threads):
+        for _ in threads:
+            queues[i].put(_STAGE_DONE)
+        for thread in threads:
+            thread.join()
+    
+    return [results[pdf_file] for pdf_file in pdf_files]
+
+def get_output_filename(apid: str) -> str:
+    return os.path.join(OUTPUT_DIR, f"{apid}_extracted.json")
+
+def is_unchanged(pdf_file: str, manifest: ProcessingManifest) -> bool:
+    # True if the PDF's extracted JSON was produced from the same file, prompt and model
     try:
-        # Extract drug name and ID from filename
         drug_name, apid = extract_info_from_filename(pdf_file)
-        
-      
-        file_id = upload_to_openai(local_file_path)
-        if not file_id:
-            raise ProcessingError("Failed to upload PDF ")
-        
-       
-        extracted_data = extract_sections(file_id, apid, drug_name)
-        if not extracted_data:
-            raise ProcessingError("Failed to extract sections")
-        
-        # Save result as JSON
-        output_filename = os.path.join(OUTPUT_DIR, f"{apid}_extracted.json")
-        save_extracted_content(extracted_data, output_filename)
-        
+    except ProcessingError:
+        return False
+    return manifest.is_current(get_output_filename(apid),
+                               file_sha256(os.path.join(LOCAL_PDF_DIR, pdf_file)),
+                               text_sha256(build_extraction_prompt(apid, drug_name)),
+                               MODEL)
+
+def upload_stage(job: Dict[str, Any]) -> None:
+    # Extract drug name and ID from filename, then upload the PDF
+    print(f"\nProcessing file: {job['file']}")
+    job["drug_name"], job["apid"] = extract_info_from_filename(job["file"])
+    
+    local_file_path = os.path.join(LOCAL_PDF_DIR, job["file"])
+    job["input_hash"] = file_sha256(local_file_path)
+    job["file_id"] = upload_to_openai(local_file_path)
+    if not job["file_id"]:
+        raise ProcessingError("Failed to upload PDF ")
+
+def extract_stage(job: Dict[str, Any]) -> None:
+    job["extracted_data"] = extract_sections(job["file_id"], job["apid"], job["drug_name"])
+    if not job["extracted_data"]:
+        raise ProcessingError("Failed to extract sections")
+
+def extract_and_post_stage(job: Dict[str, Any], post_ledger: PostLedger,
+                           section_post_executor: concurrent.futures.Executor) -> None:
+    # Like extract_stage, but each section is posted on section_post_executor as soon as it has been parsed.
+    # Futures are keyed by section name like the extracted sections, so a name the response repeats
+    # is checked by its last post, the one matching the saved content.
+    job["post_futures"] = {}
+    def on_section(section_name: str, section_data: Dict[str, Any]) -> None:
+        job["post_futures"][section_name] = section_post_executor.submit(post_section_data, section_data, post_ledger)
+    
+    job["extracted_data"] = extract_sections(job["file_id"], job["apid"], job["drug_name"], on_section=on_section)
+    if not job["extracted_data"]:
+        raise ProcessingError("Failed to extract sections")
+
+def save_stage(job: Dict[str, Any], manifest: ProcessingManifest) -> None:
+    # Save result as JSON
+    job["output_filename"] = get_output_filename(job["apid"])
+    if not save_extracted_content(job["extracted_data"], job["output_filename"]):
+        raise ProcessingError("Failed to save extracted content")
+    if isinstance(job["extracted_data"], PartialSections):
+        # Keep the file out of the manifest so the next run extracts it again
+        return
+    manifest.record(job["output_filename"], os.path.join(LOCAL_PDF_DIR, job["file"]), job["input_hash"],
+                    text_sha256(build_extraction_prompt(job["apid"], job["drug_name"])), MODEL)
+
+def post_stage(job: Dict[str, Any], post_ledger: PostLedger) -> None:
+    if "post_futures" in job:
+        # Sections were already posted during extraction; wait for those posts
+        results = [future.result() for future in job["post_futures"].values()]
+        uploaded = report_post_results(results) and job["post_futures"].keys() == job["extracted_data"].keys()
+    else:
+        uploaded = upload_extracted_data(job["output_filename"], post_ledger)
+    if not uploaded:
+        raise ProcessingError("Failed to upload sections")
+    if isinstance(job["extracted_data"], PartialSections):
+        raise ProcessingError("Response was cut short; only some sections were extracted")
+
+def process_single_file(pdf_file: str) -> bool:
+    # Process a single PDF file through the same stages, one after another
+    job = {"file": pdf_file}
+    try:
+        manifest = ProcessingManifest(os.path.join(OUTPUT_DIR, MANIFEST_FILE))
+        for stage in (upload_stage, extract_stage, functools.partial(save_stage, manifest=manifest)):
+            stage(job)
         return True
     
     except Exception as e:
@@ -121,25 +261,23 @@ def upload_all_json_files():
         print(f"Found {len(json_files)} JSON files to upload")
         
         upload_results = []
-        for json_file in json_files:
-            try:
-                # Upload each JSON, track result
-                file_path = os.path.join(OUTPUT_DIR, json_file)
-                result = upload_extracted_data(file_path)
-                upload_results.append({
-                    "file": json_file,
-                    "status": "success" if result else "failed"
-                })
-            except Exception as e:
-                # Record error if something goes wrong
-                upload_results.append({
-                    "file": json_file,
-                    "status": "failed",
-                    "error": str(e)
-                })
-            
-            # Avoid API rate limit
-            time.sleep(1)
+        with PostLedger(os.path.join(OUTPUT_DIR, LEDGER_FILE)) as post_ledger:
+            for json_file in json_files:
+                try:
+                    # Upload each JSON, track result
+                    file_path = os.path.join(OUTPUT_DIR, json_file)
+                    result = upload_extracted_data(file_path, post_ledger)
+                    upload_results.append({
+                        "file": json_file,
+                        "status": "success" if result else "failed"
+                    })
+                except Exception as e:
+                    # Record error if something goes wrong
+                    upload_results.append({
+                        "file": json_file,
+                        "status": "failed",
+                        "error": str(e)
+                    })
         
         # Print summary of upload results
         print("\nSummary of upload results:")
@@ -182,22 +320,34 @@ def upload_to_openai(file_path: str) -> Optional[str]:
         if not file_path.suffix.lower() == '.pdf':
             raise ValueError(f"File must be PDF: {file_path}")
         
-        with open(file_path, "rb") as file:
-            file_object = client.files.create(
-                file=file,
-                purpose="file-extract"
-            )
-        
-        print(f"Uploaded file. File ID: {file_object.id}")
-        return file_object.id
+        # Reuse the file_id of an earlier upload of the same content
+        return dashscope_file_cache.get_or_upload(file_path, create_file, exists=remote_file_exists)
     
     except Exception as e:
         print(f"Error uploading: {str(e)}")
         return None
 
-def extract_sections(file_id: str, apid: str, drug_name: str) -> Optional[dict]:
-    # Extract specific sections from the PDF
-    prompt =f'''Extract sections from PDE report.
+def create_file(file_path: Path) -> str:
+    with open(file_path, "rb") as file:
+        file_object = client.files.create(
+            file=file,
+            purpose="file-extract"
+        )
+    
+    print(f"Uploaded file. File ID: {file_object.id}")
+    return file_object.id
+
+def remote_file_exists(file_id: str) -> bool:
+    # Any failure to find the file just means it gets uploaded again
+    try:
+        client.files.retrieve(file_id)
+        return True
+    except Exception:
+        return False
+
+def build_extraction_prompt(apid: str, drug_name: str) -> str:
+    # Prompt for extracting the PDE sections of one PDF
+    return f'''Extract sections from PDE report.
 Required sections to extract (exactly as they appear in the document):
 
 
@@ -219,6 +369,88 @@ Output format (JSON):
     }}
 }}
 '''
+
+class SectionStreamParser:
+    """
+    Incrementally parse a response of the form {"section": {...}, ...},
+    optionally wrapped in a ```json fence, as text arrives.
+
+    Each top-level section is decoded as soon as it is complete and passed to
+    on_section(name, section); parsing is only attempted when a chunk contains
+    a closing brace, since no section can finish without one. Sections parsed
+    before a malformed part of the response are kept in self.sections.
+    """
+
+    def __init__(self, on_section=None):
+        self.on_section = on_section
+        self.sections = {}
+        self.complete = False
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = None  # Position after the last parsed section, once the opening brace was seen
+
+    def feed(self, text: str) -> None:
+        if not text or self.complete:
+            return
+        self._buffer += text
+        if self._pos is None:
+            start = self._buffer.find('{')
+            if start < 0:
+                return
+            self._pos = start + 1
+        if '}' in text:
+            self._parse()
+
+    def _skip_whitespace(self, pos: int) -> int:
+        while pos < len(self._buffer) and self._buffer[pos] in ' \t\r\n':
+            pos += 1
+        return pos
+
+    def _parse(self) -> None:
+        while True:
+            pos = self._skip_whitespace(self._pos)
+            if pos < len(self._buffer) and self._buffer[pos] == ',':
+                pos = self._skip_whitespace(pos + 1)
+            if pos >= len(self._buffer):
+                return
+            if self._buffer[pos] == '}':
+                self.complete = True
+                return
+            try:
+                name, pos = self._decoder.raw_decode(self._buffer, pos)
+                pos = self._skip_whitespace(pos)
+                if self._buffer[pos] != ':':
+                    return
+                section, pos = self._decoder.raw_decode(self._buffer, self._skip_whitespace(pos + 1))
+                # Only accept a value once what follows shows it was not cut off mid-token
+                pos = self._skip_whitespace(pos)
+                if pos >= len(self._buffer) or self._buffer[pos] not in ',}':
+                    return
+            except (json.JSONDecodeError, IndexError):
+                # Incomplete so far (or malformed; close() tells the two apart)
+                return
+            
+            self.sections[name] = section
+            self._pos = pos
+            if self.on_section:
+                self.on_section(name, section)
+            # Drop parsed text so the buffer only holds the section in progress
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+    def close(self) -> bool:
+        # Parse whatever is left; True if the whole response was well-formed
+        if self._pos is not None and not self.complete:
+            self._parse()
+        return self.complete
+
+def extract_sections(file_id: str, apid: str, drug_name: str, on_section=None,
+                     stream: bool = STREAM_RESPONSES) -> Optional[dict]:
+    # Extract specific sections from the PDF. on_section(name, section) is called for each
+    # section as soon as it is parsed; if the response is malformed part way, the sections
+    # before that point are returned as PartialSections.
+    prompt = build_extraction_prompt(apid, drug_name)
+    parser = SectionStreamParser(on_section)
     try:
         messages = [
             {'role': 'system', 'content': ''},
@@ -227,42 +459,46 @@ Output format (JSON):
         ]
         
         completion = client.chat.completions.create(
-            model="qwen-long",
+            model=MODEL,
             messages=messages,
-            stream=False
+            stream=stream
         )
         
-        if hasattr(completion, 'choices') and len(completion.choices) > 0:
-            content = completion.choices[0].message.content.strip()
-            
-            if content.startswith('```json'):
-                content = content[7:]
-            if content.endswith('```'):
-                content = content[:-3]
-            
-            try:
-                return json.loads(content.strip())
-            except json.JSONDecodeError as e:
-                print(f"JSON parse error: {str(e)}")
-                print("Response content:", content)
-                return None
+        if stream:
+            for chunk in completion:
+                if chunk.choices:
+                    parser.feed(chunk.choices[0].delta.content)
+        elif hasattr(completion, 'choices') and len(completion.choices) > 0:
+            parser.feed(completion.choices[0].message.content)
         else:
             print("Invalid response format")
             return None
             
     except Exception as e:
         print(f"Extract error: {str(e)}")
+        if not parser.sections:
+            return None
+    
+    if parser.close():
+        return parser.sections
+    
+    if not parser.sections:
+        print("JSON parse error: no complete section in response")
         return None
+    print(f"JSON parse error: keeping {len(parser.sections)} sections parsed before the error")
+    return PartialSections(parser.sections)
 
-def save_extracted_content(content: dict, output_filename: str) -> None:
+def save_extracted_content(content: dict, output_filename: str) -> bool:
     # Save extracted data to JSON
     try:
         os.makedirs(os.path.dirname(output_filename), exist_ok=True)
         with open(output_filename, 'w', encoding='utf-8') as f:
             json.dump(content, f, ensure_ascii=False, indent=2)
         print(f"Saved extracted content to {output_filename}")
+        return True
     except Exception as e:
         print(f"Error saving extracted content: {str(e)}")
+        return False
 
 def post_section(apid: str, drug_name: str, section_name: str, 
                 content: str, references: List[str]) -> Dict[str, Any]:
@@ -283,7 +519,7 @@ def post_section(apid: str, drug_name: str, section_name: str,
     }
     
     try:
-        response = requests.post(API_URL, json=payload)
+        response = get_session().post(API_URL, json=payload)
         result["status_code"] = response.status_code
         
         if response.status_code == 200:
@@ -297,37 +533,99 @@ def post_section(apid: str, drug_name: str, section_name: str,
     
     return result
 
-def upload_extracted_data(json_file_path: str) -> bool:
+def skipped_result(section_name: str) -> Dict[str, Any]:
+    return {
+        "section_name": section_name,
+        "status": "skipped",
+        "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "details": "Unchanged since last successful post"
+    }
+
+def post_section_data(section_data: Dict[str, Any], post_ledger: PostLedger) -> Dict[str, Any]:
+    # Post one extracted section unless the ledger shows this exact content was already posted
+    if post_ledger.is_posted(section_data):
+        return skipped_result(section_data["section_name"])
+    
+    result = post_section(
+        apid=section_data["APID"],
+        drug_name=section_data["drug_name"],
+        section_name=section_data["section_name"],
+        content=section_data["content"],
+        references=section_data["references"]
+    )
+    if result["status"] == "success":
+        post_ledger.record(section_data)
+    return result
+
+def post_sections_bulk(sections: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    # Send all sections of a file to BULK_API_URL in one request; None if the bulk post failed.
+    # The bulk endpoint only answers for the request as a whole, so each section's result is
+    # a success whose details say it was accepted as part of the bulk request.
+    try:
+        response = get_session().post(BULK_API_URL, json=sections)
+    except Exception as e:
+        print(f"Bulk upload failed, posting sections one by one: {str(e)}")
+        return None
+    if response.status_code != 200:
+        print(f"Bulk upload failed, posting sections one by one: HTTP {response.status_code} - {response.text}")
+        return None
+    
+    posted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return [{
+        "section_name": section["section_name"],
+        "status": "success",
+        "time": posted_at,
+        "details": f"Accepted in bulk upload of {len(sections)} sections: {response.text}",
+        "status_code": response.status_code
+    } for section in sections]
+
+def post_sections(sections: List[Dict[str, Any]], post_ledger: PostLedger) -> List[Dict[str, Any]]:
+    # Post new or changed sections concurrently, in one bulk request when BULK_API_URL is set.
+    # Returns one post_section-style result per section, in order; unchanged ones are "skipped".
+    # A section is recorded in post_ledger only when its result is a success.
+    unchanged = [post_ledger.is_posted(section) for section in sections]
+    changed = [section for section, skip in zip(sections, unchanged) if not skip]
+    
+    posted = None
+    if BULK_API_URL and changed:
+        posted = post_sections_bulk(changed)
+        if posted is not None:
+            for section, result in zip(changed, posted):
+                if result["status"] == "success":
+                    post_ledger.record(section)
+    
+    if posted is None:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=SECTION_POST_WORKERS) as executor:
+            posted = list(executor.map(functools.partial(post_section_data, post_ledger=post_ledger), changed))
+    
+    posted = iter(posted)
+    return [skipped_result(section["section_name"]) if skip else next(posted)
+            for section, skip in zip(sections, unchanged)]
+
+def report_post_results(results: List[Dict[str, Any]]) -> bool:
+    # Print each section's post result; True if none failed
+    for result in results:
+        if result['status'] == 'success':
+            print(f"Upload success: {result['section_name']}")
+        elif result['status'] == 'skipped':
+            print(f"Upload skipped (unchanged): {result['section_name']}")
+        else:
+            print(f"Upload failed: {result['section_name']}: {result['details']}")
+    
+    return all(result['status'] in ('success', 'skipped') for result in results)
+
+def upload_extracted_data(json_file_path: str, post_ledger: PostLedger) -> bool:
     # Upload JSON to the API
     print(f"\nUploading {json_file_path}")
     
     try:
         data = load_json_file(json_file_path)
         total_sections = len(data)
-        success_count = 0
         
         print(f"File has {total_sections} sections")
         
-        for section_key, section_data in data.items():
-            print(f"Uploading section: {section_data['section_name']}")
-            
-            result = post_section(
-                apid=section_data["APID"],
-                drug_name=section_data["drug_name"],
-                section_name=section_data["section_name"],
-                content=section_data["content"],
-                references=section_data["references"]
-            )
-            
-            if result['status'] == 'success':
-                success_count += 1
-                print("Upload success")
-            else:
-                print(f"Upload failed: {result['details']}")
-            
-            time.sleep(0.5)  # Avoid rate limiting
-        
-        return success_count == total_sections
+        results = post_sections(list(data.values()), post_ledger)
+        return report_post_results(results) and len(results) == total_sections
     
     except Exception as e:
         print(f"Error during upload: {str(e)}")
@@ -338,11 +636,11 @@ def load_json_file(file_path: str) -> Dict[str, Any]:
     with open(file_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def main():
-    # Main workflow
+def main(force: bool = False):
+    # Main workflow; force=True reprocesses PDFs whose outputs are up to date
     print("=== Start Batch Processing ===")
     print("\n1. Process PDF files and generate JSON")
-    process_pdf_files()
+    process_pdf_files(force=force)
     
     print("\n2. Upload generated JSON files to API")
     upload_all_json_files()
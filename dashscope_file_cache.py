@@ -0,0 +1,101 @@
+import json
+import time
+import hashlib
+import logging
+import threading
+from JsonStore import write_json_atomic
+
+# Uploaded files are reused for a week, after which they are sent again
+CACHE_FILE = "dashscope_file_cache.json"
+DEFAULT_TTL = 7 * 24 * 3600  # 7 days
+
+
+def file_sha256(file_path, block_size=1024 * 1024):
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class DashScopeFileCache:
+    """
+    Persistent map from a file's SHA-256 to the file_id DashScope returned
+    when it was uploaded, so unchanged documents are not uploaded again.
+
+    An entry is reused only while it is younger than ttl and, if an exists
+    callable is given, while the remote file is still there. Entries are
+    kept in a single JSON file, rewritten atomically on every change.
+    """
+
+    def __init__(self, cache_file=CACHE_FILE, ttl=DEFAULT_TTL):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        write_json_atomic(self.cache_file, self._entries, indent=2)
+
+    def get(self, digest):
+        """
+        Return the cached file_id for digest, or None if absent or expired.
+        """
+        with self._lock:
+            entry = self._load().get(digest)
+        if entry and time.time() - entry['uploaded_at'] < self.ttl:
+            return entry['file_id']
+        return None
+
+    def put(self, digest, file_id, file_path=None):
+        with self._lock:
+            self._load()[digest] = {'file_id': file_id, 'file_path': file_path, 'uploaded_at': time.time()}
+            self._save()
+
+    def invalidate(self, digest):
+        with self._lock:
+            if self._load().pop(digest, None) is not None:
+                self._save()
+
+    def get_or_upload(self, file_path, upload, exists=None):
+        """
+        Return a file_id for file_path, calling upload(file_path) only if no
+        fresh cached upload of the same content exists. exists(file_id) should
+        return False when the remote file is gone. A falsy file_id from upload
+        is returned as is and not cached.
+        """
+        digest = file_sha256(file_path)
+        file_id = self.get(digest)
+        if file_id and (exists is None or exists(file_id)):
+            with self._lock:
+                self.hits += 1
+            logging.info(f"Reusing uploaded file {file_id} for {file_path}")
+            return file_id
+        if file_id:
+            self.invalidate(digest)
+
+        with self._lock:
+            self.misses += 1
+        file_id = upload(file_path)
+        if file_id:
+            self.put(digest, file_id, file_path)
+        return file_id
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+# Shared cache used by the DashScope upload helpers
+dashscope_file_cache = DashScopeFileCache()
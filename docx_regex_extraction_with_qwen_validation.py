@@ -2,48 +2,70 @@ import os
 from pathlib import Path
 import openai
 import json
-from typing import Optional, Dict, List, Any, Set
+from typing import Optional, Dict, List, Any, Set, Tuple
 from docx import Document
 from docx.table import Table
 from docx.text.paragraph import Paragraph
 from docx.oxml.ns import qn
 import re
-import requests
+import tempfile
+import concurrent.futures
+from HttpClientFactory import configure_host, get_session
+from docx_stream_reader import grid_to_markdown, iter_docx_blocks
+from dashscope_file_cache import dashscope_file_cache, file_sha256
+from processing_manifest import MANIFEST_FILE, ProcessingManifest, text_sha256
+from section_validation_cache import CACHE_FILE as VALIDATION_CACHE_FILE, SectionValidationCache
+from post_ledger import LEDGER_FILE, PostLedger
 from datetime import datetime
 
-class PDEDocumentProcessor:
-    def __init__(self, api_key: Optional[str] = None):
-        # Init with API key from env or param
-        self.api_key = api_key or os.getenv("DASHSCOPE_API_KEY")
-        if not self.api_key:
-            raise ValueError("Missing API key")
-        
-        openai.api_key = self.api_key
-        openai.api_base = "https://dashscope.aliyuncs.com/compatible-mode/v1"
-        
-        self.API_URL = ""
+# Threads for the network stage of process_folder_parallel; parsing uses one process per CPU by default
+NETWORK_WORKERS = 8
+POST_WORKERS = 4  # Concurrent section posts per doc
+
+class PDEDocumentParser:
+    # CPU-bound part of document processing: splits a .docx into sections, no network access.
+    # Kept separate from PDEDocumentProcessor so it can run in worker processes.
+    def __init__(self, section_mapping: Optional[Dict[str, str]] = None, stream_reader: bool = True):
+        # stream_reader: read document.xml directly with lxml instead of building python-docx objects
+        self.stream_reader = stream_reader
 
         # Map doc sections to standardized names
-        self.SECTION_MAPPING = {
+        self.SECTION_MAPPING = section_mapping if section_mapping is not None else {
      
         }
+        self._heading_matcher_items = None
+        self._heading_pattern = None
+        self._heading_names = []
 
     def convert_table_to_markdown(self, table: Table) -> str:
         # Convert docx table to md format
-        rows = list(table.rows)
-        if not rows:
-            return ''
-            
-        md = []
-        headers = [cell.text.strip() or " " for cell in rows[0].cells]
-        md.append('| ' + ' | '.join(headers) + ' |')
-        md.append('| ' + ' | '.join(['---'] * len(headers)) + ' |')
-        
-        for row in rows[1:]:
-            cells = [cell.text.strip() for cell in row.cells]
-            md.append('| ' + ' | '.join(cells) + ' |')
-            
-        return '\n'.join(md)
+        return grid_to_markdown(self.table_to_grid(table))
+
+    def table_to_grid(self, table: Table) -> List[List[str]]:
+        return [[cell.text for cell in row.cells] for row in table.rows]
+
+    def compile_heading_matcher(self) -> None:
+        # One regex over all lowercased SECTION_MAPPING keys, rebuilt only when the mapping changes.
+        # The lookahead reports, at every position, the first key in mapping order that starts
+        # there, so the lowest index found is the key a scan of the keys in order would hit first.
+        items = tuple(self.SECTION_MAPPING.items())
+        if items == self._heading_matcher_items:
+            return
+        self._heading_matcher_items = items
+        self._heading_names = [mapped_name for _, mapped_name in items]
+        if not items:
+            self._heading_pattern = None
+            return
+        alternation = '|'.join(f'({re.escape(orig_heading.lower())})' for orig_heading, _ in items)
+        self._heading_pattern = re.compile(f'(?=(?:{alternation}))')
+
+    def match_heading(self, heading_text: str) -> Optional[str]:
+        # Mapped section name for a lowercased paragraph, or None if it is not a heading
+        self.compile_heading_matcher()
+        if self._heading_pattern is None:
+            return None
+        index = min((match.lastindex for match in self._heading_pattern.finditer(heading_text)), default=None)
+        return None if index is None else self._heading_names[index - 1]
 
     def extract_references(self, text: str, references_set: Set[int]) -> None:
         # Get ref numbers from text (handles single, ranges)
@@ -74,19 +96,152 @@ class PDEDocumentProcessor:
             elif child.tag == qn('w:tbl'):
                 yield Table(child, parent)
 
+    def iter_blocks(self, file_path: str):
+        # Yield ('paragraph', text) and ('table', cell grid) for the doc's top-level blocks
+        if self.stream_reader:
+            yield from iter_docx_blocks(file_path)
+            return
+        for block in self.iter_block_items(Document(file_path)):
+            if isinstance(block, Paragraph):
+                yield 'paragraph', block.text
+            else:
+                yield 'table', self.table_to_grid(block)
+
+    def parse_document(self, file_path: str) -> Optional[Tuple[str, str, Dict[str, Dict[str, Any]]]]:
+        # Split doc into sections; returns (apid, drug_name, sections) or None if filename is wrong
+        filename = os.path.basename(file_path)
+        filename_no_ext = os.path.splitext(filename)[0]
+        
+        # Get APID & drug name from filename
+        match = re.match(r'(A\d+)\s+(.+?)-PDE', filename_no_ext, re.IGNORECASE)
+        if not match:
+            print(f"Skip {filename}: Wrong format")
+            return None
+
+        apid = match.group(1)
+        drug_name = match.group(2).strip()
+
+        sections = {}
+        current_section = None
+        content_buffer = []
+        references_set = set()
+        
+        # Extract content by sections
+        for kind, block in self.iter_blocks(file_path):
+            if kind == 'paragraph':
+                heading_text = block.strip().lower()
+                
+                # Check if new section
+                mapped_name = self.match_heading(heading_text)
+                if mapped_name is not None:
+                    # Save prev section
+                    if current_section and content_buffer:
+                        content = '\n'.join(content_buffer).strip()
+                        if content:
+                            if current_section not in sections:
+                                sections[current_section] = {
+                                    "APID": apid,
+                                    "drug_name": drug_name,
+                                    "section_name": current_section,
+                                    "content": content,
+                                    "references": sorted(list(references_set))
+                                }
+                            else:
+                                sections[current_section]["content"] += '\n' + content
+                                sections[current_section]["references"] = sorted(
+                                    list(set(sections[current_section]["references"]) | references_set)
+                                )
+                    
+                    current_section = mapped_name
+                    content_buffer = []
+                    references_set = set()
+                
+                # Add to current section
+                elif current_section:
+                    content_buffer.append(block)
+                    self.extract_references(block, references_set)
+            
+            elif kind == 'table' and current_section:
+                markdown_table = grid_to_markdown(block)
+                if markdown_table:
+                    content_buffer.append(markdown_table)
+                table_text = '\n'.join([cell for row in block for cell in row])
+                self.extract_references(table_text, references_set)
+
+        # Save last section
+        if current_section and content_buffer:
+            content = '\n'.join(content_buffer).strip()
+            if content:
+                if current_section not in sections:
+                    sections[current_section] = {
+                        "APID": apid,
+                        "drug_name": drug_name,
+                        "section_name": current_section,
+                        "content": content,
+                        "references": sorted(list(references_set))
+                    }
+                else:
+                    sections[current_section]["content"] += '\n' + content
+                    sections[current_section]["references"] = sorted(
+                        list(set(sections[current_section]["references"]) | references_set)
+                    )
+
+        # Clear PDE calc refs
+        if "PDE Calculation" in sections:
+            sections["PDE Calculation"]["references"] = []
+
+        return apid, drug_name, sections
+
+_worker_parser = None
+
+def parse_pde_document(section_mapping: Dict[str, str], file_path: str):
+    # Process pool entry point: parse one doc in a worker process (parser reused per process)
+    global _worker_parser
+    if _worker_parser is None or _worker_parser.SECTION_MAPPING != section_mapping:
+        _worker_parser = PDEDocumentParser(section_mapping)
+    return _worker_parser.parse_document(file_path)
+
+class PDEDocumentProcessor(PDEDocumentParser):
+    def __init__(self, api_key: Optional[str] = None):
+        super().__init__()
+
+        # Init with API key from env or param
+        self.api_key = api_key or os.getenv("DASHSCOPE_API_KEY")
+        if not self.api_key:
+            raise ValueError("Missing API key")
+        
+        openai.api_key = self.api_key
+        openai.api_base = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+        
+        self.API_URL = ""
+        self.MODEL = "qwen-long"
+        if self.API_URL:
+            configure_host(self.API_URL, POST_WORKERS * NETWORK_WORKERS)
+
     def upload_file_to_qianwen(self, file_path: str) -> str:
-        # Upload to Qianwen, get file ID
+        # Upload to Qianwen, get file ID (reused if the same content was uploaded before)
         try:
-            with open(file_path, "rb") as file:
-                file_object = openai.File.create(file=file, purpose="file-extract")
-            return file_object.id
+            return dashscope_file_cache.get_or_upload(file_path, self._create_file, exists=self._remote_file_exists)
         except Exception as e:
             print(f"Upload err: {str(e)}")
             return None
 
-    def validate_with_ai(self, sections_data: Dict[str, Dict], original_file_id: str, extracted_file_id: str) -> Dict[str, Dict]:
-        # AI validate/correct sections using Qwen
-        prompt = f'''
+    def _create_file(self, file_path: str) -> str:
+        with open(file_path, "rb") as file:
+            file_object = openai.File.create(file=file, purpose="file-extract")
+        return file_object.id
+
+    def _remote_file_exists(self, file_id: str) -> bool:
+        # Any failure to find the file just means it gets uploaded again
+        try:
+            openai.File.retrieve(file_id)
+            return True
+        except Exception:
+            return False
+
+    def build_validation_prompt(self) -> str:
+        # Prompt for validating/correcting the extracted sections against the original doc
+        return f'''
 
 
 
@@ -96,9 +251,22 @@ class PDEDocumentProcessor:
 
                  '''
 
+    def prompt_hash(self) -> str:
+        # Outputs depend on the section mapping as well as the validation prompt
+        return text_sha256(self.build_validation_prompt() + json.dumps(self.SECTION_MAPPING, sort_keys=True))
+
+    def validate_with_ai(self, sections_data: Dict[str, Dict], original_file_id: str, extracted_file_id: str) -> Dict[str, Dict]:
+        # AI validate/correct sections using Qwen; sections_data unchanged if validation fails
+        validated_sections = self.request_validation(original_file_id, extracted_file_id)
+        return sections_data if validated_sections is None else validated_sections
+
+    def request_validation(self, original_file_id: str, extracted_file_id: str) -> Optional[Dict[str, Dict]]:
+        # Ask Qwen to validate/correct the sections in the extracted file; None on failure
+        prompt = self.build_validation_prompt()
+
         try:
             resp = openai.ChatCompletion.create(
-                model="qwen-long",
+                model=self.MODEL,
                 messages=[
                     {"role": "system", "content": ""},
                     {"role": "system", "content": f"fileid://{original_file_id}"},
@@ -120,153 +288,195 @@ class PDEDocumentProcessor:
                     return json.loads(result_text[json_start:json_end])
                 except json.JSONDecodeError:
                     print("JSON parse err")
-                    return sections_data
+                    return None
             
-            return sections_data
+            return None
             
         except Exception as e:
             print(f"AI validation err: {str(e)}")
-            return sections_data
+            return None
 
     def post_to_api(self, section_data: Dict[str, Any]) -> bool:
         # Post section to API endpoint
         try:
-            resp = requests.post(self.API_URL, json=section_data)
+            resp = get_session().post(self.API_URL, json=section_data)
             return resp.status_code == 200
         except Exception as e:
             print(f"API err for {section_data['section_name']}: {str(e)}")
             return False
 
-    def process_document(self, file_path: str, output_dir: str) -> Dict[str, Dict[str, Any]]:
-        # Extract & process doc sections
-        filename = os.path.basename(file_path)
-        filename_no_ext = os.path.splitext(filename)[0]
+    def post_sections(self, sections: Dict[str, Dict[str, Any]], post_ledger: Optional[PostLedger] = None) -> None:
+        # Post sections concurrently; with a ledger, sections already posted unchanged are skipped
+        changed = [section_data for section_data in sections.values()
+                   if post_ledger is None or not post_ledger.is_posted(section_data)]
+        if len(changed) < len(sections):
+            print(f"Skip {len(sections) - len(changed)} unchanged sections")
         
-        # Get APID & drug name from filename
-        match = re.match(r'(A\d+)\s+(.+?)-PDE', filename_no_ext, re.IGNORECASE)
-        if not match:
-            print(f"Skip {filename}: Wrong format")
-            return {}
-
-        apid = match.group(1)
-        drug_name = match.group(2).strip()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=POST_WORKERS) as executor:
+            for section_data, posted in zip(changed, executor.map(self.post_to_api, changed)):
+                if posted and post_ledger is not None:
+                    post_ledger.record(section_data)
 
+    def process_document(self, file_path: str, output_dir: str,
+                         manifest: Optional[ProcessingManifest] = None,
+                         validation_cache: Optional[SectionValidationCache] = None,
+                         post_ledger: Optional[PostLedger] = None) -> Dict[str, Dict[str, Any]]:
+        # Extract & process doc sections; the validated output is recorded in manifest if given
         try:
-            doc = Document(file_path)
-            sections = {}
-            current_section = None
-            content_buffer = []
-            references_set = set()
-            
-            # Extract content by sections
-            for block in self.iter_block_items(doc):
-                if isinstance(block, Paragraph):
-                    para = block
-                    heading_text = para.text.strip().lower()
-                    
-                    # Check if new section
-                    for orig_heading, mapped_name in self.SECTION_MAPPING.items():
-                        if orig_heading.lower() in heading_text:
-                            # Save prev section
-                            if current_section and content_buffer:
-                                content = '\n'.join(content_buffer).strip()
-                                if content:
-                                    if current_section not in sections:
-                                        sections[current_section] = {
-                                            "APID": apid,
-                                            "drug_name": drug_name,
-                                            "section_name": current_section,
-                                            "content": content,
-                                            "references": sorted(list(references_set))
-                                        }
-                                    else:
-                                        sections[current_section]["content"] += '\n' + content
-                                        sections[current_section]["references"] = sorted(
-                                            list(set(sections[current_section]["references"]) | references_set)
-                                        )
-                            
-                            current_section = mapped_name
-                            content_buffer = []
-                            references_set = set()
-                            break
-                    
-                    # Add to current section
-                    if current_section and not any(orig_heading.lower() in heading_text 
-                                                 for orig_heading in self.SECTION_MAPPING):
-                        content_buffer.append(para.text)
-                        self.extract_references(para.text, references_set)
-                
-                elif isinstance(block, Table) and current_section:
-                    markdown_table = self.convert_table_to_markdown(block)
-                    if markdown_table:
-                        content_buffer.append(markdown_table)
-                    table_text = '\n'.join([cell.text for row in block.rows for cell in row.cells])
-                    self.extract_references(table_text, references_set)
-
-            # Save last section
-            if current_section and content_buffer:
-                content = '\n'.join(content_buffer).strip()
-                if content:
-                    if current_section not in sections:
-                        sections[current_section] = {
-                            "APID": apid,
-                            "drug_name": drug_name,
-                            "section_name": current_section,
-                            "content": content,
-                            "references": sorted(list(references_set))
-                        }
-                    else:
-                        sections[current_section]["content"] += '\n' + content
-                        sections[current_section]["references"] = sorted(
-                            list(set(sections[current_section]["references"]) | references_set)
-                        )
-
-            # Clear PDE calc refs
-            if "PDE Calculation" in sections:
-                sections["PDE Calculation"]["references"] = []
+            parsed = self.parse_document(file_path)
+        except Exception as e:
+            self.report_error(e)
+            return {}
+        if parsed is None:
+            return {}
+        return self.finish_document(file_path, output_dir, parsed[2], manifest, validation_cache, post_ledger)
 
+    def finish_document(self, file_path: str, output_dir: str, sections: Dict[str, Dict[str, Any]],
+                        manifest: Optional[ProcessingManifest] = None,
+                        validation_cache: Optional[SectionValidationCache] = None,
+                        post_ledger: Optional[PostLedger] = None) -> Dict[str, Dict[str, Any]]:
+        # Network part of processing a parsed doc: save, upload, validate and post its sections.
+        # Sections found in validation_cache are reused; only the others are sent for validation.
+        # Sections post_ledger shows were already posted with the same content are not posted again.
+        filename_no_ext = os.path.splitext(os.path.basename(file_path))[0]
+        try:
             # Save initial JSON
             initial_output = os.path.join(output_dir, f"{filename_no_ext}_initial.json")
             with open(initial_output, 'w', encoding='utf-8') as f:
                 json.dump(sections, f, ensure_ascii=False, indent=2)
 
-            # Upload docs for validation
-            original_file_id = self.upload_file_to_qianwen(file_path)
-            if not original_file_id:
+            # AI validation of the sections not validated in an earlier run
+            validated_sections = self.validate_sections(file_path, initial_output, sections, validation_cache)
+            if validated_sections is None:
+                # Keep only the initial output; with no _validated.json or manifest entry
+                # the doc is validated again on the next run
+                print(f"Validation failed for {filename_no_ext}; kept {initial_output} only")
                 return sections
-
-            extracted_file_id = self.upload_file_to_qianwen(initial_output)
-            if not extracted_file_id:
-                return sections
-            
-            # AI validation
-            validated_sections = self.validate_with_ai(sections, original_file_id, extracted_file_id)
             
             # Save validated JSON
             final_output = os.path.join(output_dir, f"{filename_no_ext}_validated.json")
             with open(final_output, 'w', encoding='utf-8') as f:
                 json.dump(validated_sections, f, ensure_ascii=False, indent=2)
+            if manifest is not None:
+                manifest.record(final_output, file_path, file_sha256(file_path), self.prompt_hash(), self.MODEL)
             
             # Post to API
-            for section_name, section_data in validated_sections.items():
-                self.post_to_api(section_data)
+            self.post_sections(validated_sections, post_ledger)
 
             return validated_sections
 
         except Exception as e:
-            print(f"Process err: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
+            self.report_error(e)
             return {}
 
-    def process_folder(self, input_folder: str, output_folder: str):
-        # Process all docs in folder
-        os.makedirs(output_folder, exist_ok=True)
+    def validate_sections(self, file_path: str, initial_output: str, sections: Dict[str, Dict[str, Any]],
+                          validation_cache: Optional[SectionValidationCache] = None) -> Optional[Dict[str, Dict]]:
+        # Validated sections, in doc order; None if the docs could not be uploaded or validation failed
+        doc_hash = file_sha256(file_path)
+        prompt_version = self.prompt_hash()
+        cached = {}
+        if validation_cache is not None:
+            for section_name, section_data in sections.items():
+                validated = validation_cache.get(section_data, doc_hash, prompt_version)
+                if validated is not None:
+                    cached[section_name] = validated
+        changed = {name: section_data for name, section_data in sections.items() if name not in cached}
+        if not changed:
+            print(f"All {len(sections)} sections already validated")
+            return cached
+        
+        # Upload docs for validation
+        original_file_id = self.upload_file_to_qianwen(file_path)
+        if not original_file_id:
+            return None
+        
+        if len(changed) == len(sections):
+            extracted_file_id = self.upload_file_to_qianwen(initial_output)
+        else:
+            # Smaller request: only the sections that changed since they were last validated
+            print(f"Validating {len(changed)} of {len(sections)} sections")
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                changed_output = os.path.join(tmp_dir, os.path.basename(initial_output))
+                with open(changed_output, 'w', encoding='utf-8') as f:
+                    json.dump(changed, f, ensure_ascii=False, indent=2)
+                extracted_file_id = self.upload_file_to_qianwen(changed_output)
+        if not extracted_file_id:
+            return None
         
+        result = self.request_validation(original_file_id, extracted_file_id)
+        if result is None:
+            return None
+        if validation_cache is not None:
+            for section_name, section_data in changed.items():
+                if section_name in result:
+                    validation_cache.put(section_data, doc_hash, prompt_version, result[section_name])
+        
+        validated_sections = {}
+        for section_name in sections:
+            if section_name in cached:
+                validated_sections[section_name] = cached[section_name]
+            elif section_name in result:
+                validated_sections[section_name] = result[section_name]
+        for section_name, section_data in result.items():
+            validated_sections.setdefault(section_name, section_data)
+        return validated_sections
+
+    def report_error(self, e: Exception) -> None:
+        print(f"Process err: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+
+    def documents_to_process(self, input_folder: str, output_folder: str,
+                             manifest: ProcessingManifest, force: bool = False) -> List[str]:
+        # Paths of new or changed docs in folder (all of them if force)
+        prompt_hash = self.prompt_hash()
+        file_paths = []
         for filename in os.listdir(input_folder):
             if filename.endswith('.docx'):
                 file_path = os.path.join(input_folder, filename)
-                self.process_document(file_path, output_folder)
+                final_output = os.path.join(output_folder, f"{os.path.splitext(filename)[0]}_validated.json")
+                if not force and manifest.is_current(final_output, file_sha256(file_path), prompt_hash, self.MODEL):
+                    print(f"Skip {filename}: Unchanged")
+                    continue
+                file_paths.append(file_path)
+        return file_paths
+
+    def process_folder(self, input_folder: str, output_folder: str, force: bool = False):
+        # Process new or changed docs in folder (all of them if force)
+        os.makedirs(output_folder, exist_ok=True)
+        manifest = ProcessingManifest(os.path.join(output_folder, MANIFEST_FILE))
+        
+        with SectionValidationCache(os.path.join(output_folder, VALIDATION_CACHE_FILE)) as validation_cache, \
+                PostLedger(os.path.join(output_folder, LEDGER_FILE)) as post_ledger:
+            for file_path in self.documents_to_process(input_folder, output_folder, manifest, force):
+                self.process_document(file_path, output_folder, manifest, validation_cache, post_ledger)
+
+    def process_folder_parallel(self, input_folder: str, output_folder: str, force: bool = False,
+                                parse_workers: Optional[int] = None, network_workers: int = NETWORK_WORKERS):
+        # Same outputs as process_folder, but docs are parsed in a process pool and each parsed
+        # doc's upload / validation / posting runs in a thread pool while other docs are parsed
+        os.makedirs(output_folder, exist_ok=True)
+        manifest = ProcessingManifest(os.path.join(output_folder, MANIFEST_FILE))
+        file_paths = self.documents_to_process(input_folder, output_folder, manifest, force)
+        
+        with SectionValidationCache(os.path.join(output_folder, VALIDATION_CACHE_FILE)) as validation_cache, \
+                PostLedger(os.path.join(output_folder, LEDGER_FILE)) as post_ledger, \
+                concurrent.futures.ProcessPoolExecutor(max_workers=parse_workers) as parse_pool, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=network_workers) as network_pool:
+            parse_futures = {parse_pool.submit(parse_pde_document, self.SECTION_MAPPING, file_path): file_path
+                             for file_path in file_paths}
+            network_futures = []
+            for future in concurrent.futures.as_completed(parse_futures):
+                try:
+                    parsed = future.result()
+                except Exception as e:
+                    self.report_error(e)
+                    continue
+                if parsed is not None:
+                    network_futures.append(network_pool.submit(
+                        self.finish_document, parse_futures[future], output_folder, parsed[2], manifest,
+                        validation_cache, post_ledger))
+            concurrent.futures.wait(network_futures)
 
 def main():
     try:
@@ -275,7 +485,7 @@ def main():
         output_folder = "path/to/output"
         
         processor = PDEDocumentProcessor()
-        processor.process_folder(input_folder, output_folder)
+        processor.process_folder_parallel(input_folder, output_folder)
         
     except Exception as e:
         print(f"Main err: {str(e)}")
@@ -0,0 +1,132 @@
+import zipfile
+from typing import Iterator, List, Tuple, Union
+from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def _w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+BODY = _w('body')
+P = _w('p')
+R = _w('r')
+HYPERLINK = _w('hyperlink')
+TBL = _w('tbl')
+TR = _w('tr')
+TC = _w('tc')
+TC_PR = _w('tcPr')
+GRID_SPAN = _w('gridSpan')
+V_MERGE = _w('vMerge')
+VAL = _w('val')
+TYPE = _w('type')
+
+# Run children that contribute text, as python-docx renders them
+RUN_TEXT = {
+    _w('t'): None,
+    _w('tab'): '\t',
+    _w('ptab'): '\t',
+    _w('cr'): '\n',
+    _w('noBreakHyphen'): '-',
+}
+BR = _w('br')
+
+Block = Tuple[str, Union[str, List[List[str]]]]
+
+
+def run_text(r) -> str:
+    parts = []
+    for child in r:
+        if child.tag in RUN_TEXT:
+            text = RUN_TEXT[child.tag]
+            parts.append((child.text or '') if text is None else text)
+        elif child.tag == BR and child.get(TYPE, 'textWrapping') == 'textWrapping':
+            # Page and column breaks carry no text
+            parts.append('\n')
+    return ''.join(parts)
+
+
+def paragraph_text(p) -> str:
+    # Text of the paragraph's runs, including runs inside hyperlinks
+    parts = []
+    for child in p:
+        if child.tag == R:
+            parts.append(run_text(child))
+        elif child.tag == HYPERLINK:
+            parts.extend(run_text(r) for r in child if r.tag == R)
+    return ''.join(parts)
+
+
+def table_grid(tbl) -> List[List[str]]:
+    """
+    Cell texts of a table, one list per row with one entry per grid column.
+
+    Like python-docx's row.cells, a cell spanning several columns (gridSpan)
+    is repeated for each column, and a vertically merged continuation cell
+    (vMerge) repeats the text of the cell above it.
+    """
+    grid = []
+    for tr in tbl.iterchildren(TR):
+        row = []
+        for tc in tr.iterchildren(TC):
+            span = 1
+            merge = None
+            tc_pr = tc.find(TC_PR)
+            if tc_pr is not None:
+                grid_span = tc_pr.find(GRID_SPAN)
+                if grid_span is not None:
+                    span = int(grid_span.get(VAL, 1))
+                v_merge = tc_pr.find(V_MERGE)
+                if v_merge is not None:
+                    merge = v_merge.get(VAL, 'continue')
+
+            column = len(row)
+            if merge == 'continue' and grid and column < len(grid[-1]):
+                text = grid[-1][column]
+            else:
+                text = '\n'.join(paragraph_text(p) for p in tc.iterchildren(P))
+            row.extend([text] * span)
+        grid.append(row)
+    return grid
+
+
+def iter_docx_blocks(file_path: str) -> Iterator[Block]:
+    """
+    Stream the top-level paragraphs and tables of a .docx body in document order.
+
+    Yields ('paragraph', text) and ('table', grid) pairs (see table_grid). The
+    document XML is read with iterparse and each block is discarded once it has
+    been yielded, so memory use stays bounded however long the document is.
+    """
+    with zipfile.ZipFile(file_path) as docx, docx.open('word/document.xml') as xml:
+        for _, elem in etree.iterparse(xml, events=('end',), tag=(P, TBL), huge_tree=True):
+            parent = elem.getparent()
+            if parent is None or parent.tag != BODY:
+                # Part of a table or other container; handled with its top-level block
+                continue
+            if elem.tag == P:
+                yield 'paragraph', paragraph_text(elem)
+            else:
+                yield 'table', table_grid(elem)
+            # Free this block and anything before it (sectPr, sdt, ...) in the body
+            elem.clear()
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+def grid_to_markdown(grid: List[List[str]]) -> str:
+    # Markdown table from a cell grid; first row is the header
+    if not grid:
+        return ''
+
+    md = []
+    headers = [cell.strip() or " " for cell in grid[0]]
+    md.append('| ' + ' | '.join(headers) + ' |')
+    md.append('| ' + ' | '.join(['---'] * len(headers)) + ' |')
+
+    for row in grid[1:]:
+        cells = [cell.strip() for cell in row]
+        md.append('| ' + ' | '.join(cells) + ' |')
+
+    return '\n'.join(md)
@@ -0,0 +1,40 @@
+from datetime import datetime
+from JsonStore import JsonlLog, json_sha256
+
+LEDGER_FILE = "post_ledger.jsonl"
+
+
+class PostLedger:
+    """
+    Append-only JSON Lines ledger of sections successfully posted to the API.
+
+    Each record() appends {"APID", "section_name", "hash", "time"}; the latest
+    line for an (APID, section_name) wins when the ledger is loaded.
+    is_posted() is True only if that exact section content was the last one
+    posted, so new and modified sections are still sent.
+    """
+
+    def __init__(self, path=LEDGER_FILE):
+        self.path = path
+        self._log = JsonlLog(path, key=lambda entry: (entry['APID'], entry['section_name']))
+
+    def is_posted(self, section):
+        entry = self._log.get((section['APID'], section['section_name']))
+        return entry is not None and entry['hash'] == json_sha256(section)
+
+    def record(self, section):
+        self._log.append({
+            'APID': section['APID'],
+            'section_name': section['section_name'],
+            'hash': json_sha256(section),
+            'time': datetime.now().isoformat(timespec='seconds')
+        })
+
+    def close(self):
+        self._log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
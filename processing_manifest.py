@@ -0,0 +1,52 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+from JsonStore import write_json_atomic
+
+MANIFEST_FILE = "processing_manifest.json"
+
+
+def text_sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ProcessingManifest:
+    """
+    Records, for each generated output file, the hash of the input it was
+    built from, the hash of the prompt used and the model name.
+
+    is_current() tells a batch run whether an output can be kept: it must
+    still exist and have been produced from the same input, prompt and model.
+    The manifest is a JSON file rewritten atomically on every record().
+    """
+
+    def __init__(self, path=MANIFEST_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def is_current(self, output_path, input_hash, prompt_hash, model):
+        with self._lock:
+            entry = self._entries.get(output_path)
+        return (entry is not None
+                and entry['input_hash'] == input_hash
+                and entry['prompt_hash'] == prompt_hash
+                and entry['model'] == model
+                and os.path.exists(output_path))
+
+    def record(self, output_path, input_path, input_hash, prompt_hash, model):
+        with self._lock:
+            self._entries[output_path] = {
+                'input': input_path,
+                'input_hash': input_hash,
+                'prompt_hash': prompt_hash,
+                'model': model,
+                'time': datetime.now().isoformat(timespec='seconds')
+            }
+            write_json_atomic(self.path, self._entries, ensure_ascii=False, indent=2)
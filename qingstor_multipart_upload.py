@@ -1,10 +1,97 @@
 import os
+import json
 import math
+import mmap
+import hashlib
+import threading
+import concurrent.futures
 import logging
 from urllib.parse import quote_plus
 from qingstor.sdk.service.qingstor import QingStor
 from qingstor.sdk.config import Config
 from tqdm import tqdm
+from JsonStore import write_json_atomic
+
+# QingStor multipart limits
+MIN_PART_SIZE = 5 * 1024 * 1024  # 5MB
+MAX_PART_SIZE = 5 * 1024 * 1024 * 1024  # 5GB
+MAX_PARTS = 10000
+# Aim for about this many parts; larger files get larger parts instead of more requests
+TARGET_PARTS = 1000
+
+# Upload ids and finished parts of unfinished multipart uploads, so a failed upload can be resumed
+UPLOAD_STATE_FILE = "qingstor_upload_state.json"
+# Several uploads may run at once (see sync_directory); they share the state file
+_upload_state_lock = threading.Lock()
+
+# sync_directory sends files smaller than this with a single PUT instead of a multipart upload
+SMALL_FILE_THRESHOLD = 16 * 1024 * 1024  # 16MB
+# Response header carrying the content MD5 stored by content_metadata()
+MD5_METADATA_HEADER = 'x-qs-meta-md5'
+
+
+def choose_part_size(file_size):
+    """
+    Pick a part size (a whole number of MB) that splits file_size into about
+    TARGET_PARTS parts, never below MIN_PART_SIZE or above MAX_PARTS parts.
+    """
+    mb = 1024 * 1024
+    part_size = max(MIN_PART_SIZE, math.ceil(file_size / TARGET_PARTS / mb) * mb)
+    if part_size > MAX_PART_SIZE or math.ceil(file_size / part_size) > MAX_PARTS:
+        raise ValueError(f"File of {file_size} bytes exceeds QingStor's multipart upload limits")
+    return part_size
+
+
+def file_fingerprint(filepath, part_size):
+    """
+    Identify the file contents and part layout a saved upload state belongs to
+    """
+    stat = os.stat(filepath)
+    return f"{stat.st_size}:{stat.st_mtime_ns}:{part_size}"
+
+
+def load_upload_state(state_file=UPLOAD_STATE_FILE):
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_upload_state(state, state_file=UPLOAD_STATE_FILE):
+    write_json_atomic(state_file, state, indent=2)
+
+
+def update_upload_state(object_key, entry, state_file=UPLOAD_STATE_FILE):
+    """
+    Store (or with entry=None, remove) one object's upload state
+    """
+    with _upload_state_lock:
+        state = load_upload_state(state_file)
+        if entry is None:
+            state.pop(object_key, None)
+        else:
+            state[object_key] = entry
+        save_upload_state(state, state_file)
+
+
+def file_md5(filepath, block_size=1024 * 1024):
+    md5 = hashlib.md5()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
+def is_md5_etag(etag):
+    # Objects from a single PUT have the content MD5 as etag; multipart etags are not an MD5 of the content
+    return len(etag) == 32 and all(c in '0123456789abcdef' for c in etag.lower())
+
+
+def content_metadata(md5):
+    """
+    User metadata recording the content MD5, which multipart etags don't give
+    """
+    return {'md5': md5} if md5 else None
 
 
 class Qingstor:
@@ -29,11 +116,12 @@ class Qingstor:
         service = QingStor(config)
         self.bucket = service.Bucket(self.bucket_name, self.zone_name)
 
-    def initiate_multipart_upload(self, object_key):
+    def initiate_multipart_upload(self, object_key, md5=None):
         """
-        Start multipart upload, return upload ID
+        Start multipart upload, return upload ID. The content MD5, if given, is
+        stored in the object's metadata.
         """
-        response = self.bucket.initiate_multipart_upload(object_key)
+        response = self.bucket.initiate_multipart_upload(object_key, x_qs_meta_data=content_metadata(md5))
         if response.status_code in (200, 201):
             return response['upload_id']
         else:
@@ -70,51 +158,244 @@ class Qingstor:
             logging.error(f"Failed to complete multipart upload for {object_key}. Status: {response.status_code}")
             return False
 
-    def multipart_upload(self, object_key, filepath):
+    def abort_multipart_upload(self, object_key, upload_id):
         """
-        Perform multipart upload of the file
+        Abort a multipart upload so the server discards its parts
         """
-        # Start multipart upload
-        upload_id = self.initiate_multipart_upload(object_key)
+        response = self.bucket.abort_multipart_upload(object_key, upload_id=upload_id)
+        if response.status_code == 204:
+            logging.info(f"Aborted upload {upload_id} of {object_key}")
+            return True
+        else:
+            logging.warning(f"Failed to abort upload {upload_id} of {object_key}. Status: {response.status_code}")
+            return False
 
-        logging.info("upload_id: {}".format(upload_id))
-        if not upload_id:
-            return None
+    def list_uploaded_parts(self, object_key, upload_id):
+        """
+        Return {part_number: (etag, size)} for the parts the server already has,
+        or None if the upload can't be listed (e.g. it was aborted or has expired)
+        """
+        parts = {}
+        marker = 0
+        while True:
+            response = self.bucket.list_multipart(object_key, upload_id=upload_id, part_number_marker=marker)
+            if response.status_code != 200:
+                logging.warning(f"Failed to list parts of upload {upload_id} for {object_key}. Status: {response.status_code}")
+                return None
+            object_parts = response['object_parts'] or []
+            for part in object_parts:
+                parts[int(part['part_number'])] = (part['etag'].strip('"'), part['size'])
+            if not object_parts or len(parts) >= response['count']:
+                return parts
+            marker = max(parts) + 1
+
+    def upload_part_from_view(self, object_key, upload_id, view, part_number, offset, part_size):
+        """
+        Upload one part as a memoryview slice of the memory-mapped file (no copy).
+        Safe to call from several threads at once.
+        """
+        with view[offset:offset + part_size] as chunk:
+            # QingStor does not allow empty parts in a multipart upload: an empty part does not
+            # contribute to the object's content and makes the API return an error, so a part
+            # past the end of the file (e.g. if it shrank after we sized it) is never sent.
+            if not len(chunk):
+                return None
+            return self.upload_part(object_key, upload_id, part_number, chunk)
 
-        etags = []
+    def multipart_upload(self, object_key, filepath, max_workers=1, resume=False, state_file=UPLOAD_STATE_FILE, md5=None):
+        """
+        Perform multipart upload of the file, uploading up to max_workers parts in parallel.
+        md5, the file's content MD5, is stored in the object's metadata.
 
+        The upload id and every finished part's etag are saved to state_file as
+        the upload goes. With resume=True an unfinished upload of the same file
+        (same size, mtime and part size) is continued: its saved parts are
+        checked against the parts the server has and only the missing ones are sent.
+        Any other saved upload of object_key is aborted, so its parts don't linger
+        on the server.
+        """
         file_size = os.stat(filepath).st_size
-        chunk_size = 5 * 1024 * 1024  # Each part is 5MB
+        if not file_size:
+            # A multipart upload needs at least one non-empty part
+            raise ValueError(f"Cannot multipart upload empty file {filepath}")
+        chunk_size = choose_part_size(file_size)
         parts_count = math.ceil(file_size / chunk_size)
+        fingerprint = file_fingerprint(filepath, chunk_size)
+
+        # Parts finish in any order; keep etags indexed by part number for complete_multipart_upload
+        etags = [None] * parts_count
+
+        with _upload_state_lock:
+            entry = load_upload_state(state_file).get(object_key)
+        upload_id = None
+        if entry and not (resume and entry['fingerprint'] == fingerprint):
+            self.abort_multipart_upload(object_key, entry['upload_id'])
+        elif entry:
+            server_parts = self.list_uploaded_parts(object_key, entry['upload_id'])
+            if server_parts is not None:
+                upload_id = entry['upload_id']
+                for part_number in range(1, parts_count + 1):
+                    part_size = min(chunk_size, file_size - (part_number - 1) * chunk_size)
+                    etag, size = server_parts.get(part_number, (None, None))
+                    # Trust a part only if the server has it complete and, if we saved its
+                    # etag, with the same etag (otherwise it was overwritten since)
+                    if etag and size == part_size and entry['parts'].get(str(part_number), etag) == etag:
+                        etags[part_number - 1] = etag
+                logging.info(f"Resuming upload {upload_id} of {object_key}: "
+                             f"{parts_count - etags.count(None)}/{parts_count} parts already uploaded")
 
-        with open(filepath, 'rb') as f, tqdm(total=file_size, unit='B', unit_scale=True, desc=object_key) as pbar:
-            for part_number in range(1, parts_count + 1):
-                part_size = min(chunk_size, file_size - (part_number - 1) * chunk_size)
-                chunk = f.read(part_size)
-
-                # Check if the chunk is empty
-              
-          
-                # When splitting a file into multiple parts, it's possible that the file size is exactly a multiple
-                # of the chunk size. In this scenario, after reading all the parts, we may reach a final iteration
-                # where the code attempts to read another chunk but there is nothing left to read.
-                # This results in an empty chunk (zero bytes). QingStor does not allow empty parts in a multipart
-                # upload because an empty part does not contribute to the actual content of the object and will
-                # cause the API to return an error.
-                # 
-                # To avoid this issue, we check if the chunk is empty and break out of the loop if it is.
-                # This way, only meaningful data parts are uploaded, ensuring a successful multipart upload.
-                if not chunk:  # Skip if chunk is empty
-                    break
-
-                etag = self.upload_part(object_key, upload_id, part_number, chunk)
-                if not etag:
-                    raise Exception(f"Failed to upload part {part_number}")
-                etags.append(etag)
+        if not upload_id:
+            # Start multipart upload
+            upload_id = self.initiate_multipart_upload(object_key, md5)
+
+            logging.info("upload_id: {}".format(upload_id))
+            if not upload_id:
+                return None
+
+        entry = {
+            'fingerprint': fingerprint,
+            'upload_id': upload_id,
+            'parts': {str(i + 1): etag for i, etag in enumerate(etags) if etag}
+        }
+        update_upload_state(object_key, entry, state_file)
+
+        missing = [part_number for part_number in range(1, parts_count + 1) if not etags[part_number - 1]]
+        uploaded_bytes = sum(min(chunk_size, file_size - i * chunk_size) for i, etag in enumerate(etags) if etag)
+        logging.info(f"Uploading {object_key} in {parts_count} parts of {chunk_size} bytes, {len(missing)} to send")
+
+        # Parts are sent straight from a read-only memory map, so no part is copied into a bytes object
+        with open(filepath, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                memoryview(mapped) as view, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                tqdm(total=file_size, initial=uploaded_bytes, unit='B', unit_scale=True, desc=object_key) as pbar:
+            future_to_part = {}
+            for part_number in missing:
+                offset = (part_number - 1) * chunk_size
+                part_size = min(chunk_size, file_size - offset)
+                future = executor.submit(self.upload_part_from_view, object_key, upload_id,
+                                         view, part_number, offset, part_size)
+                future_to_part[future] = (part_number, part_size)
+
+            for future in concurrent.futures.as_completed(future_to_part):
+                part_number, part_size = future_to_part[future]
+                try:
+                    etag = future.result()
+                    if not etag:
+                        raise Exception(f"Failed to upload part {part_number}; rerun with resume=True to continue")
+                except Exception:
+                    # Don't start the remaining parts once one has failed
+                    for pending in future_to_part:
+                        pending.cancel()
+                    raise
+                etags[part_number - 1] = etag
+                entry['parts'][str(part_number)] = etag
+                update_upload_state(object_key, entry, state_file)
                 pbar.update(part_size)
 
         # Complete the multipart upload
-        return self.complete_multipart_upload(object_key, upload_id, etags)
+        completed = self.complete_multipart_upload(object_key, upload_id, etags)
+        if completed:
+            update_upload_state(object_key, None, state_file)
+        return completed
+
+    def put_file(self, object_key, filepath, md5=None):
+        """
+        Upload a whole file with a single PUT request, storing md5 in the object's metadata
+        """
+        with open(filepath, 'rb') as f:
+            body = f.read()
+        response = self.bucket.put_object(object_key, content_length=len(body), body=body,
+                                          x_qs_meta_data=content_metadata(md5))
+        if response.status_code == 201:
+            logging.info(f"Uploaded {object_key}")
+            return True
+        else:
+            logging.error(f"Failed to upload {object_key}. Status: {response.status_code}")
+            return False
+
+    def list_remote_objects(self, prefix='', limit=1000):
+        """
+        Return {object_key: {'size': ..., 'etag': ...}} for every object under prefix
+        """
+        objects = {}
+        marker = ''
+        while True:
+            response = self.bucket.list_objects(prefix=prefix, marker=marker, limit=limit)
+            if response.status_code != 200:
+                raise Exception(f"Failed to list objects under {prefix}. Status: {response.status_code}")
+            for key in response['keys'] or []:
+                objects[key['key']] = {'size': key['size'], 'etag': key['etag'].strip('"')}
+            marker = response['next_marker']
+            if not marker:
+                return objects
+
+    def remote_md5(self, object_key):
+        """
+        Return the content MD5 stored in a remote object's metadata at upload time, or None
+        """
+        response = self.bucket.head_object(object_key)
+        if response.status_code == 200:
+            return response.headers.get(MD5_METADATA_HEADER)
+        logging.warning(f"Failed to get metadata of {object_key}. Status: {response.status_code}")
+        return None
+
+    def upload_file(self, object_key, filepath, small_file_threshold=SMALL_FILE_THRESHOLD, md5=None):
+        """
+        Upload one file, with a single PUT if it is small and as a resumable multipart upload otherwise.
+        The content MD5 (computed if not given) is stored in the object's metadata.
+        """
+        if md5 is None:
+            md5 = file_md5(filepath)
+        if os.path.getsize(filepath) < small_file_threshold:
+            return self.put_file(object_key, filepath, md5)
+        return self.multipart_upload(object_key, filepath, resume=True, md5=md5)
+
+    def sync_file(self, object_key, filepath, remote_object, small_file_threshold=SMALL_FILE_THRESHOLD):
+        """
+        Upload filepath unless remote_object (from list_remote_objects, or None)
+        already has the same size and content MD5. Returns 'uploaded', 'skipped' or 'failed'.
+        """
+        md5 = file_md5(filepath)
+        if remote_object and remote_object['size'] == os.path.getsize(filepath):
+            # A single-PUT etag is already the MD5; only multipart objects need a HEAD for their metadata
+            etag = remote_object['etag']
+            if (etag if is_md5_etag(etag) else self.remote_md5(object_key)) == md5:
+                return 'skipped'
+        return 'uploaded' if self.upload_file(object_key, filepath, small_file_threshold, md5) else 'failed'
+
+    def sync_directory(self, local_dir, prefix='', max_workers=8, small_file_threshold=SMALL_FILE_THRESHOLD):
+        """
+        Upload every file under local_dir to prefix + its relative path, up to
+        max_workers files at a time. Files whose remote copy already has the same
+        size and content MD5 are skipped; the MD5s are computed in the worker
+        threads. Returns {'uploaded': [...], 'skipped': [...], 'failed': [...]}
+        lists of object keys.
+        """
+        remote = self.list_remote_objects(prefix)
+        results = {'uploaded': [], 'skipped': [], 'failed': []}
+
+        local_files = {}
+        for root, _, files in os.walk(local_dir):
+            for name in files:
+                filepath = os.path.join(root, name)
+                local_files[prefix + os.path.relpath(filepath, local_dir).replace(os.sep, '/')] = filepath
+        logging.info(f"Syncing {local_dir} to {prefix}: {len(local_files)} files, {len(remote)} remote objects")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_key = {executor.submit(self.sync_file, object_key, filepath, remote.get(object_key),
+                                             small_file_threshold): object_key
+                             for object_key, filepath in local_files.items()}
+            for future in tqdm(concurrent.futures.as_completed(future_to_key), total=len(future_to_key), desc="Syncing"):
+                object_key = future_to_key[future]
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    logging.error(f"Failed to upload {object_key}: {e}")
+                    outcome = 'failed'
+                results[outcome].append(object_key)
+
+        return results
 
 # Test code
 if __name__ == "__main__":
@@ -130,10 +411,16 @@ if __name__ == "__main__":
     local_file_path = r"<your_local_file_path>"
 
     if os.path.exists(local_file_path):
-        success = qingstor.multipart_upload(object_key, local_file_path)
+        success = qingstor.multipart_upload(object_key, local_file_path, max_workers=4, resume=True)
         if success:
             print(f"File {local_file_path} uploaded successfully to {object_key}.")
         else:
             print(f"Failed to upload file {local_file_path}.")
     else:
         print(f"File {local_file_path} does not exist. Check the file path.")
+
+    # Test directory sync
+    local_dir = r"<your_local_directory>"
+    if os.path.isdir(local_dir):
+        results = qingstor.sync_directory(local_dir, prefix="demo/results/", max_workers=8)
+        print(f"Uploaded {len(results['uploaded'])}, skipped {len(results['skipped'])}, failed {len(results['failed'])} files.")
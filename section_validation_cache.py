@@ -0,0 +1,45 @@
+from datetime import datetime
+from JsonStore import JsonlLog, json_sha256
+
+CACHE_FILE = "section_validation_cache.jsonl"
+
+
+class SectionValidationCache:
+    """
+    Append-only JSON Lines cache of AI-validated sections.
+
+    Each entry maps (section hash, source document hash, prompt version) to
+    the validated section the model returned, so a rerun only sends sections
+    whose extracted text, source document or validation prompt changed. The
+    latest line for a key wins when the cache is loaded.
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self._log = JsonlLog(path, key=lambda entry: entry['key'])
+
+    def _key(self, section, doc_hash, prompt_version):
+        return f"{json_sha256(section)}:{doc_hash}:{prompt_version}"
+
+    def get(self, section, doc_hash, prompt_version):
+        """
+        Return the cached validated section, or None if it has not been validated.
+        """
+        entry = self._log.get(self._key(section, doc_hash, prompt_version))
+        return entry['validated'] if entry else None
+
+    def put(self, section, doc_hash, prompt_version, validated):
+        self._log.append({
+            'key': self._key(section, doc_hash, prompt_version),
+            'validated': validated,
+            'time': datetime.now().isoformat(timespec='seconds')
+        })
+
+    def close(self):
+        self._log.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()